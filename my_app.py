@@ -2,9 +2,9 @@
 
 from __future__ import annotations
 import streamlit as st
-from utils.data_loader import load_data
-from utils.scoring import compute_scores
+from utils.data_loader import fetch_data
 from utils.data_loader import load_index
+from utils.refresher import BackgroundRefresher
 from utils.authenticate import authenticate, logout
 
 
@@ -17,16 +17,31 @@ st.set_page_config(page_title="MLF – Dashboard",page_icon=":material/dashboard
 #     st.success(f"Bienvenue, {user} ! 🎉")
 #     st.session_state["show_welcome"] = False
 
+@st.cache_resource(show_spinner=False)
+def data_refresher() -> BackgroundRefresher:
+    # Partagé entre sessions : recharge et rescore la source en arrière-plan
+    return BackgroundRefresher(fetch_data).start()
+
+
 # Étape 1
 with st.spinner("Chargement des données…"):
-        df = load_data()
-        df = compute_scores(df)
-        df_index = load_index()
+        try:
+            snapshot = data_refresher().current()
+        except Exception as e:
+            st.error(f"Impossible de charger les données depuis Google Sheets : {e}")
+            st.stop()
+        df = snapshot.df
+        ocr_index = load_index()
 
+if snapshot.source == "snapshot":
+    st.warning("Google Sheets ne répond pas : affichage de la dernière copie locale des données.")
 
 
 st.session_state['df'] = df
-st.session_state['df_index'] = df_index
+st.session_state['data_version'] = snapshot.version
+st.session_state['data_age'] = snapshot.age
+st.session_state['rescored_rows'] = snapshot.rescored_rows
+st.session_state['ocr_index'] = ocr_index
 
 
 
@@ -43,6 +58,11 @@ pg = st.navigation(pages,position="top")
 pg.run()
 
 
+st.sidebar.caption(
+    f"Données v{snapshot.version[:8]} · il y a {snapshot.age / 60:.0f} min · "
+    f"{snapshot.rescored_rows}/{len(df)} lignes rescorées"
+)
+
 # Bouton de déconnexion
 if st.sidebar.button("Se déconnecter"):
     logout()
@@ -3,6 +3,9 @@ from __future__ import annotations
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from utils.aggregates import METRICS, network_aggregates, ranking_page, ranking_rows
+from utils.network_map import DEFAULT_ZOOM, map_figure, map_points
+from utils.versioning import CACHED_VERSIONS
 
 st.header("Vue d’ensemble du réseau")
 
@@ -14,26 +17,24 @@ if df is None or df.empty:
     st.warning("Aucune donnée disponible. Ouvrez la page Home")
     st.stop()
 
-# --- Contrôles
-METRICS = {
-    "Score global": "score_global",
-    "Résultats aux examens": "score_resultats_aux_examens",
-    "Gouvernance & sécurité": "score_gouvernance_securite",
-    "Stratégie & partenariats": "score_strategie_partenariats",
-    "Climat & inclusion": "score_climat_inclusion",
-    "Ouverture linguistique & culturelle": "score_ouverture_linguistique",
-    "Ressources & numérique": "score_ressources_numerique",
-}
+@st.cache_resource(show_spinner=False, max_entries=CACHED_VERSIONS)
+def _network_aggregates(_df: pd.DataFrame, version: str):
+    # Calculés une fois par version des données, partagés entre sessions
+    return network_aggregates(_df, version)
 
 
-kpis = {
-    "Résultats aux examens": df["score_resultats_aux_examens"].mean(),
-    "Gouvernance & sécurité": df["score_gouvernance_securite"].mean(),
-    "Stratégie & partenariats": df["score_strategie_partenariats"].mean(),
-    "Climat & inclusion": df["score_climat_inclusion"].mean(),
-    "Ouverture linguistique & culturelle": df["score_ouverture_linguistique"].mean(),
-    "Ressources & numérique": df["score_ressources_numerique"].mean(),
-}
+aggregates = _network_aggregates(df, st.session_state.get("data_version", ""))
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHED_VERSIONS)
+def _map_points(_df: pd.DataFrame, version: str):
+    return map_points(_df, version)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _map_figure(_points, version: str, metric_col: str, zoom: int):
+    # Une figure par (version, indicateur, niveau de zoom), partagée entre sessions
+    return map_figure(_points, metric_col, zoom)
 
 
 # --- KPIs (6 x st.metric)
@@ -41,15 +42,9 @@ col1,col2=st.columns([1,3])
 
 with col1 :
     with st.container(border=True):
-        mean_score = df["score_global"].mean()
-        st.metric("Score global", f"{mean_score:.1f}/100")
+        st.metric("Score global", f"{aggregates.global_mean:.1f}/100")
     with st.container(border=True):
-        kpis_df = (
-            pd.DataFrame.from_dict(kpis, orient="index", columns=["valeur"])
-            .reset_index()
-            .rename(columns={"index": "indicateur"})
-            .sort_values("valeur", ascending=True)
-        )
+        kpis_df = aggregates.dimension_means()
 
 
         fig = px.bar(
@@ -87,35 +82,12 @@ with col2 :
     )
     metric_col = METRICS[metric_label]
 
-    lat_col, lon_col = "latitude", "longitude"
-    name_col = "etablissement"
-    has_geo = all(c in df.columns for c in (lat_col, lon_col, name_col))
-    map_df = df.dropna(subset=[lat_col, lon_col])
-    fig = px.scatter_mapbox(
-        df,
-        lat="latitude",
-        lon="longitude",
-        hover_name="etablissement",
-        color=metric_col,
-        color_continuous_scale="Viridis",
-        zoom=1,
-        height=500,
-        custom_data=[df["score_global"]],  # <-- on injecte le score global
-    )
-
-    # Customiser le hover (nom + score global)
-    fig.update_traces(
-        hovertemplate="<b>%{hovertext}</b><br>Score global = %{customdata[0]:.1f}<extra></extra>"
-    )
-
-    fig.update_layout(mapbox_style="carto-positron", margin=dict(l=0, r=0, t=0, b=0))
-
-
-        # Fixer la taille des points et l'opacité
-    fig.update_traces(marker=dict(size=15, opacity=0.7))
-
-        # Mise en page et affichage
-    fig.update_layout(mapbox_style="open-street-map", margin=dict(l=0, r=0, t=0, b=0),coloraxis_colorbar=dict(title="Moyenne"))
+    points = _map_points(df, st.session_state.get("data_version", ""))
+    zoom = DEFAULT_ZOOM
+    if points.aggregated:
+        # Réseau étendu : établissements regroupés par zone, plus fins à mesure qu'on zoome
+        zoom = st.select_slider("Niveau de détail de la carte", options=list(range(1, 9)), value=DEFAULT_ZOOM)
+    fig = _map_figure(points, points.version, metric_col, zoom)
     st.plotly_chart(fig, use_container_width=True)
 
 st.divider()
@@ -125,24 +97,43 @@ st.divider()
 st.subheader("Classements complet")
 
 
-def ranking_table_full(d: pd.DataFrame) -> pd.DataFrame:
-    cols = [
-        "etablissement",
-        "score_global",
-        "score_resultats_aux_examens",
-        "score_gouvernance_securite",
-        "score_strategie_partenariats",
-        "score_climat_inclusion",
-        "score_ouverture_linguistique",
-        "score_ressources_numerique",
-    ]
-    dd = d[cols].copy()
-    dd = dd.dropna(subset=["score_global"])
-    dd = dd.sort_values(by="score_global", ascending=False)
-    return dd.reset_index(drop=True)
-
-# Affichage dans Streamlit
-st.dataframe(ranking_table_full(df), use_container_width=True)
+PAGE_SIZES = [25, 50, 100]
+
+
+def _first_page():
+    st.session_state["ranking_page"] = 1
+
+
+c_sort, c_order, c_country, c_size = st.columns([3, 2, 2, 1])
+with c_sort:
+    sort_label = st.selectbox("Trier par", list(METRICS), on_change=_first_page)
+with c_order:
+    descending = st.segmented_control(
+        "Ordre", ["Décroissant", "Croissant"], default="Décroissant", on_change=_first_page
+    ) != "Croissant"
+with c_country:
+    country = st.selectbox("Pays", ["Tous", *aggregates.countries], on_change=_first_page)
+with c_size:
+    page_size = st.selectbox("Lignes", PAGE_SIZES, index=1, on_change=_first_page)
+
+# Tri et filtre sur l'ordre précalculé : seule la page visible est envoyée au navigateur
+rows = ranking_rows(aggregates, METRICS[sort_label], descending, None if country == "Tous" else country)
+total = len(rows)
+n_pages = max(1, -(-total // page_size))
+st.session_state["ranking_page"] = min(st.session_state.get("ranking_page", 1), n_pages)
+page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="ranking_page")
+visible = ranking_page(df, rows, page, page_size)
+
+st.dataframe(
+    visible,
+    use_container_width=True,
+    column_config={
+        "rang_global": st.column_config.NumberColumn("Rang"),
+        "pct_pays_global": st.column_config.NumberColumn("Percentile pays", format="P%d"),
+    },
+)
+first = (page - 1) * page_size + 1
+st.caption(f"Établissements {min(first, total)}–{min(page * page_size, total)} sur {total} · page {page}/{n_pages}")
 
 st.divider()
 
@@ -8,6 +8,9 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import streamlit as st
+from utils.etab_index import etab_index
+from utils.scoring import rank_col
+from utils.versioning import CACHED_VERSIONS
 
 st.header("Fiche établissement")
 
@@ -65,7 +68,7 @@ INFO_BLOCKS = [
 #     return [s]
 
 def format_cell(val, col):
-    if val is None or (isinstance(val, float) and math.isnan(val)):
+    if val is None or val is pd.NA or (isinstance(val, float) and math.isnan(val)):
         return "—"
     s = str(val).strip()
     if not s:
@@ -83,9 +86,20 @@ def format_cell(val, col):
 
 
 
-def score_mean(series: pd.Series) -> float:
-    s = pd.to_numeric(series, errors="coerce")
-    return float(s.mean()) if s.notna().any() else float("nan")
+def list_items(val) -> list[str]:
+    if val is None or val is pd.NA or (isinstance(val, float) and math.isnan(val)):
+        return []
+    return [x.strip() for x in str(val).split(",") if x.strip()]
+
+
+def position(row: pd.Series, col: str) -> str:
+    # Rangs et percentiles précalculés au scoring (add_ranks) : simple lecture
+    rang, pct = row.get(rank_col(col)), row.get(rank_col(col, "pct_pays"))
+    if rang is None or pd.isna(rang):
+        return "—"
+    text = f"rang {rang}/{index.network_counts[col]}"
+    return text if pct is None or pd.isna(pct) else f"{text}, P{pct} dans le pays"
+
 
 # ---- Sélecteur d'établissement ---------------------------------------------
 name_col = "etablissement"
@@ -93,26 +107,28 @@ if name_col not in df.columns:
     st.error("Colonne 'etablissement' introuvable dans la source.")
     st.stop()
 
-# Construire un label enrichi : "etablissement – ville (pays)"
-choices = []
-labels = {}
-for _, r in df.iterrows():
-    etab = str(r.get("etablissement", "—"))
-    ville = str(r.get("ville", "—"))
-    pays = str(r.get("pays", "—"))
-    label = f"{etab} – {ville} ({pays})"
-    choices.append(label)
-    labels[label] = etab  # mapping vers le vrai nom d'établissement
+@st.cache_resource(show_spinner=False, max_entries=CACHED_VERSIONS)
+def _etab_index(_df: pd.DataFrame, version: str):
+    # Libellés, positions et moyennes réseau : une fois par version des données
+    return etab_index(_df, version)
 
-# Sélecteur dans la sidebar
-selected_label = st.sidebar.selectbox("Choisir un établissement", sorted(choices))
 
-# Récupérer la ligne correspondante
-selected_etab = labels[selected_label]
-row = df[df[name_col] == selected_etab].iloc[0]
+index = _etab_index(df, st.session_state.get("data_version", ""))
+if st.session_state.get("etab_id") not in index.positions:
+    # Établissement disparu de la nouvelle version des données : retour au premier
+    st.session_state.pop("etab_id", None)
+
+# Sélecteur dans la sidebar (libellé "etablissement – ville (pays)", homonymes numérotés)
+selected_id = st.sidebar.selectbox(
+    "Choisir un établissement", index.options, format_func=index.label, key="etab_id"
+)
+selected_label = index.label(selected_id)
+row = index.row(df, selected_id)
 
 # ---- En-tête: KPI + infos ---------------------------------------------------
 st.subheader(selected_label)
+if pd.notna(row.get("score_global")):
+    st.caption(f"Score global {row['score_global']:.1f}/100 · {position(row, 'score_global')}")
 left, right = st.columns([1, 1])
 with left:
     # Mapping des noms techniques -> labels lisibles
@@ -156,7 +172,7 @@ with left:
 with right:
     cats = [t[0] for t in THEMES]
     etab_vals = [row.get(col, None) for _, col in THEMES]
-    mean_vals = [score_mean(df[col]) if col in df.columns else float("nan") for _, col in THEMES]
+    mean_vals = [index.network_means[col] for _, col in THEMES]
 
 
     df_radar = pd.DataFrame({
@@ -201,18 +217,25 @@ with right:
         )
     st.plotly_chart(fig)
 
+    df_position = pd.DataFrame({
+        "Dimension": cats,
+        "Score": etab_vals,
+        "Position": [position(row, col) for _, col in THEMES],
+    })
+    st.dataframe(df_position, use_container_width=True, hide_index=True)
+
 
 # Points forts
-pf_items = [x.strip() for x in str(row.get("points_forts", "")).split(",") if x.strip()]
+pf_items = list_items(row.get("points_forts"))
 df_pf = pd.DataFrame({"⊕ Points forts": pf_items if pf_items else ["—"]})
 st.dataframe(df_pf, use_container_width=True, height=200)
 
 # Points faibles
-pfb_items = [x.strip() for x in str(row.get("points_faibles", "")).split(",") if x.strip()]
+pfb_items = list_items(row.get("points_faibles"))
 df_pfb = pd.DataFrame({"⊖ Points faibles": pfb_items if pfb_items else ["—"]})
 st.dataframe(df_pfb, use_container_width=True, height=200)
 
 # Recommandations
-reco_items = [x.strip() for x in str(row.get("recommandations", "")).split(",") if x.strip()]
+reco_items = list_items(row.get("recommandations"))
 df_reco = pd.DataFrame({"💡 Recommandations": reco_items if reco_items else ["—"]})
 st.dataframe(df_reco, use_container_width=True, height=200)
@@ -1,116 +1,152 @@
 
 
-import numpy as np
+import asyncio
+import time
 import streamlit as st
-from openai import OpenAI
-from utils.data_loader import load_index
+from openai import AsyncOpenAI, OpenAI
+from utils.data_loader import CACHE_DIR, load_index
+from utils import retrieval
+from utils.ann import ANN_MIN_CHUNKS, DEFAULT_NPROBE, load_or_build_ivf
+from utils.embeddings import DEFAULT_MODEL, CachedEmbeddings, OpenAIEmbeddings
+from utils.llm import TurnTimings, stream_chat
+from utils.matcher import EtabMatcher
+from utils.lexical import load_or_build_lexical
+from utils.answer_cache import AnswerCache
+from utils.prompts import build_messages
+from utils.context import POOL_SIZE, count_tokens, pack_context
+from utils.qa_async import plan_comparison
+from utils.versioning import CACHED_VERSIONS
 
 # ---- Config OpenAI ----
-client = OpenAI(api_key=st.secrets["KEY"]["OPENAI_API_KEY"])
+# OPENAI_BASE_URL (optionnel) : serveur compatible, ex. python -m utils.fake_openai en local
+OPENAI_KWARGS = dict(api_key=st.secrets["KEY"]["OPENAI_API_KEY"], base_url=st.secrets["KEY"].get("OPENAI_BASE_URL"))
+client = OpenAI(**OPENAI_KWARGS)
+
+# ---- Embeddings des questions (cache mémoire + disque, partagé entre sessions) ----
+EMBED_TIMEOUT = 5  # secondes ; au-delà, la recherche se rabat sur l'index lexical local
+
+@st.cache_resource
+def get_embedder(model: str = DEFAULT_MODEL) -> CachedEmbeddings:
+    return CachedEmbeddings(OpenAIEmbeddings(client, model, timeout=EMBED_TIMEOUT), CACHE_DIR / "embeddings.sqlite")
 
 # ---- Charger index vectoriel ----
-if "df_index" not in st.session_state:
-    st.session_state["df_index"] = load_index()
+if "ocr_index" not in st.session_state:
+    st.session_state["ocr_index"] = load_index()
+
+ocr_index = st.session_state["ocr_index"]
+
+# ---- Index approché (grands corpus uniquement) ----
+@st.cache_resource(
+    show_spinner="Construction de l’index de recherche approchée…", max_entries=CACHED_VERSIONS
+)
+def get_ann(_index, version: str):
+    return load_or_build_ivf(_index)
+
+ann = get_ann(ocr_index, ocr_index.version) if len(ocr_index) >= ANN_MIN_CHUNKS else None
+nprobe = DEFAULT_NPROBE
+if ann is not None:
+    nprobe = st.sidebar.select_slider(
+        "Recherche : rapidité ↔ exhaustivité",
+        options=[1, 2, 4, 8, 16, 32, 64],
+        value=DEFAULT_NPROBE,
+    )
 
-df_index = st.session_state["df_index"]
+# ---- Index lexical (termes exacts, fonctionne sans réseau) ----
+@st.cache_resource(show_spinner="Construction de l’index lexical…", max_entries=CACHED_VERSIONS)
+def get_lexical(_index, version: str):
+    return load_or_build_lexical(_index)
 
-# ---- Liste des établissements disponibles ----
-ETABS = sorted(df_index["doc"].unique())
+lexical = get_lexical(ocr_index, ocr_index.version)
+local_only = st.sidebar.toggle("Recherche locale uniquement", value=False,
+                               help="N’appelle pas le service d’embedding (recherche par mots-clés).")
 
-# ---- Similarité cosinus ----
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+# ---- Détection des établissements cités dans la question ----
+@st.cache_resource(max_entries=CACHED_VERSIONS)
+def get_matcher(_index, version: str) -> EtabMatcher:
+    return EtabMatcher(_index.docs)
 
-# ---- Détection d’établissement dans la question ----
-def detect_etab(query: str) -> str | None:
-    for etab in ETABS:
-        if etab.lower().replace("_", " ") in query.lower():
-            return etab
-    return None
+matcher = get_matcher(ocr_index, ocr_index.version)
+
+def detect_etabs(query: str) -> list[str]:
+    return matcher.find_all(query)
+
+# ---- Cache des réponses (invalidé à chaque nouvelle version de l’index) ----
+@st.cache_resource(max_entries=CACHED_VERSIONS)
+def get_answer_cache(version: str) -> AnswerCache:
+    return AnswerCache(CACHE_DIR / "answers.sqlite", version)
+
+answer_cache = get_answer_cache(ocr_index.version)
 
 # ---- Recherche ----
-def search(query, etab=None, top_k=5, model="text-embedding-3-small"):
-    resp = client.embeddings.create(model=model, input=query)
-    query_emb = np.array(resp.data[0].embedding)
-
-    sub_df = df_index if etab is None else df_index[df_index["doc"] == etab]
-
-    sims = []
-    for _, row in sub_df.iterrows():
-        if row["embedding"] is None:
-            continue
-        emb = np.array(row["embedding"])
-        sims.append((cosine_similarity(query_emb, emb), row["doc"], row["page"], row["text"]))
-
-    return sorted(sims, key=lambda x: x[0], reverse=True)[:top_k]
-
-# ---- Génération réponse (non streaming) ----
-def answer_question(query, top_k=5):
-    etab = detect_etab(query)
-    results = search(query, etab=etab, top_k=top_k)
-
-    context = "\n\n".join([f"[{doc}, p.{page}] {text[:800]}..." for _, doc, page, text in results])
-
-    if etab:
-        system_prompt = f"""
-        Tu es un assistant expert en analyse et synthèse de rapports d’homologation et de suivi
-        d’établissements français à l’étranger.
-
-        Contexte : tu aides l’équipe de pilotage de la Mission Laïque Française / OSUI (tête de réseau)
-        à exploiter ces documents. Réponds UNIQUEMENT pour l’établissement : {etab}.
-
-        Règles de réponse :
-        - Appuie-toi uniquement sur les extraits fournis (ne jamais inventer).
-        - Structure systématiquement la réponse avec des titres clairs.
-        - Mets les éléments en liste à puces pour la lisibilité.
-        - Intègre toujours les références de pages quand elles sont disponibles.
-        - Organise la réponse autour des rubriques suivantes si possible :
-            * Gouvernance et contexte
-            * Atouts et points forts
-            * Points de vigilance / critiques
-            * Recommandations et axes de travail prioritaires
-            * Enjeux pour le pilotage réseau (MLF/OSUI)
-        - Si la question implique une comparaison avec d’autres établissements, présente une
-        analyse comparative structurée.
-        - Termine par une courte synthèse stratégique orientée “tête de réseau”.
-        """
-    else:
-        system_prompt = """
-        Tu es un assistant expert en analyse et synthèse de rapports d’homologation et de suivi
-        d’établissements français à l’étranger.
-
-        Contexte : tu aides l’équipe de pilotage de la Mission Laïque Française / OSUI (tête de réseau)
-        à exploiter ces documents. Réponds en t’appuyant uniquement sur les extraits fournis.
-
-        Règles de réponse :
-        - Appuie-toi uniquement sur les extraits fournis (ne jamais inventer).
-        - Structure systématiquement la réponse avec des titres clairs.
-        - Mets les éléments en liste à puces pour la lisibilité.
-        - Intègre toujours les références de pages quand elles sont disponibles.
-        - Organise la réponse autour des rubriques suivantes si possible :
-            * Gouvernance et contexte
-            * Atouts et points forts
-            * Points de vigilance / critiques
-            * Recommandations et axes de travail prioritaires
-            * Enjeux pour le pilotage réseau (MLF/OSUI)
-        - Si la question implique une comparaison avec plusieurs établissements, présente une
-        analyse comparative structurée.
-        - Termine par une courte synthèse stratégique orientée “tête de réseau”.
-        """
-
-
-    user_prompt = f"Question : {query}\n\nExtraits :\n{context}"
-
-    response = client.chat.completions.create(
-        model="gpt-5",
-        temperature=1,
-        messages=[
-            {"role": "system", "content": system_prompt.strip()},
-            {"role": "user", "content": user_prompt}
-        ]
+def embed_query(query, model=DEFAULT_MODEL):
+    if local_only:
+        return None
+    try:
+        return get_embedder(model).embed_query(query)
+    except Exception:
+        st.toast("Service d’embedding indisponible : recherche par mots-clés uniquement.")
+        return None
+
+def search(query, query_emb=None, etab=None, top_k=5):
+    return retrieval.hybrid_search(
+        ocr_index, query, query_emb, lexical, etab=etab, top_k=top_k, ann=ann, nprobe=nprobe
     )
 
-    return response.choices[0].message.content
+def cached_answer(answer, timings: TurnTimings | None = None):
+    if timings is not None:
+        timings.first_token = timings.finished = time.perf_counter()
+    yield answer
+
+def store_answer(stream, key):
+    parts = []
+    for part in stream:
+        parts.append(part)
+        yield part
+    answer_cache.put(*key, "".join(parts))
+
+# ---- Génération réponse (streaming) ----
+def packed_context(results, query_emb):
+    return pack_context(ocr_index, results, query_emb).text
+
+def prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+def answer_comparison(query, etabs, top_k=POOL_SIZE, timings: TurnTimings | None = None):
+    # Plusieurs établissements : retrieval et synthèses par établissement en parallèle,
+    # puis une synthèse comparative finale en streaming
+    cached = {}
+
+    def in_cache(plan):
+        cached["answer"] = answer_cache.get(query, plan.query_emb, etabs, plan.chunks)
+        return cached["answer"] is not None
+
+    plan = asyncio.run(plan_comparison(
+        lambda: AsyncOpenAI(**OPENAI_KWARGS), ocr_index, query, etabs,
+        embed=None if local_only else get_embedder().embed_query,
+        lexical=lexical, top_k=top_k, skip_map=in_cache, context_builder=packed_context,
+    ))
+    if cached["answer"] is not None:
+        return cached_answer(cached["answer"], timings)
+    key = (query, plan.query_emb, etabs, plan.chunks)
+    if timings is not None:
+        timings.prompt_tokens = prompt_tokens(plan.messages)
+    return store_answer(stream_chat(client, plan.messages, timings=timings), key)
+
+def answer_question(query, top_k=POOL_SIZE, timings: TurnTimings | None = None):
+    etabs = detect_etabs(query)
+    if len(etabs) > 1:
+        return answer_comparison(query, etabs, top_k, timings)
+    query_emb = embed_query(query)
+    results = search(query, query_emb, etab=etabs or None, top_k=top_k)
+
+    key = (query, query_emb, etabs, [h.chunk for h in results])
+    if (answer := answer_cache.get(*key)) is not None:
+        return cached_answer(answer, timings)
+
+    messages = build_messages(query, etabs, packed_context(results, query_emb))
+    if timings is not None:
+        timings.prompt_tokens = prompt_tokens(messages)
+    return store_answer(stream_chat(client, messages, timings=timings), key)
 
 # ---- UI ----
 st.header("Votre espace de questions")
@@ -137,8 +173,19 @@ if query := st.chat_input("Pose ta question sur les rapports d’homologation...
     with st.chat_message("user"):
         st.markdown(query)
 
-    # Génération et affichage de la réponse
-    answer = answer_question(query)
-    st.session_state["messages"].append({"role": "assistant", "content": answer})
+    # Génération et affichage progressif de la réponse
+    timings = TurnTimings()
     with st.chat_message("assistant"):
-        st.markdown(answer)   # ✅ Markdown bien rendu
+        answer = st.write_stream(answer_question(query, timings=timings))
+        st.caption(
+            f"Premiers mots après {timings.ttft or 0:.1f} s · réponse complète en {timings.total or 0:.1f} s"
+            + (f" · prompt de {timings.prompt_tokens} tokens" if timings.prompt_tokens else "")
+        )
+    st.session_state["messages"].append({"role": "assistant", "content": answer})
+    st.session_state.setdefault("qa_timings", []).append(timings.as_dict())
+
+# Diagnostic de l’index
+with st.sidebar.expander("Index des rapports"):
+    st.caption(f"Cache de réponses : {answer_cache.hits} réutilisées · {answer_cache.misses} générées")
+    st.caption(f"{len(ocr_index)} extraits · version {ocr_index.version[:8]}")
+    st.dataframe(ocr_index.chunk_counts().rename("extraits"), use_container_width=True)
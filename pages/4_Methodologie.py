@@ -1,7 +1,11 @@
 # pages/3_Methodologie.py
+import time
+import numpy as np
+import pandas as pd
 import streamlit as st
 import plotly.express as px
-from utils.scoring import get_weights
+from utils.scoring import DEFAULT_WEIGHTS, dimension_matrix, get_weights, reweight
+from utils.versioning import CACHED_VERSIONS
 
 # Charger les pondérations
 weights = get_weights()
@@ -99,3 +103,57 @@ fig.update_traces(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+
+
+# --- Section 4 : Simulation ---
+st.subheader("4. Simuler d’autres pondérations")
+
+df = st.session_state.get("df")
+if df is None or df.empty:
+    st.info("Chargez les données (page RÉSEAU) pour simuler d’autres pondérations.")
+    st.stop()
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHED_VERSIONS)
+def _dimension_matrix(_df: pd.DataFrame, version: str):
+    # Construite une fois par version des données, partagée entre sessions
+    return dimension_matrix(_df, version)
+
+
+matrix = _dimension_matrix(df, st.session_state.get("data_version", ""))
+
+weight_keys = list(DEFAULT_WEIGHTS)
+sim_cols = st.columns(3)
+sim_weights = {}
+for i, (label, key) in enumerate(zip(labels, weight_keys)):
+    with sim_cols[i % 3]:
+        sim_weights[key] = st.slider(
+            label, min_value=0, max_value=100, value=int(round(weights[key] * 100)), step=5,
+            key=f"w_{key}",
+        )
+
+if sum(sim_weights.values()) == 0:
+    st.warning("Au moins une dimension doit avoir un poids non nul.")
+    st.stop()
+
+t0 = time.perf_counter()
+# Curseurs en % -> mêmes flottants que DEFAULT_WEIGHTS (30 / 100 == 0.3) : aux réglages
+# par défaut, score_simulé reproduit exactement score_global
+sim_scores = reweight(matrix, {k: v / 100 for k, v in sim_weights.items()})
+order = np.argsort(-np.nan_to_num(sim_scores, nan=-1.0), kind="stable")
+# Même règle d'ex aequo que rang_global (add_ranks) : rang « min »
+sim_ranks = pd.Series(sim_scores).rank(ascending=False, method="min").to_numpy()
+elapsed_ms = (time.perf_counter() - t0) * 1000
+
+ranks_ref = df["rang_global"].to_numpy(dtype=float, na_value=np.nan)  # précalculé au scoring
+sim_df = pd.DataFrame({
+    "etablissement": df["etablissement"].to_numpy()[order] if "etablissement" in df.columns else order,
+    "score_simulé": sim_scores[order],
+    "score_global": df["score_global"].to_numpy()[order],
+    "rang_actuel": ranks_ref[order],
+})
+sim_df.insert(1, "rang_simulé", sim_ranks[order])
+sim_df = sim_df.dropna(subset=["score_simulé"])
+
+st.caption(f"Classement recalculé sur {len(matrix.values)} établissements en {elapsed_ms:.1f} ms.")
+st.dataframe(sim_df, use_container_width=True, hide_index=True)
@@ -0,0 +1,118 @@
+"""
+Agrégats réseau de la page RÉSEAU, calculés une fois par version des données.
+
+Tout ce qui ne dépend que du df scoré (statistiques par dimension, ordre de chaque
+indicateur, codes pays du filtre) est précalculé ici ; la page ne fait que lire le résultat.
+"""
+from __future__ import annotations
+import warnings
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from utils.scoring import COUNTRY_COL, SCORE_TO_WEIGHT, rank_col
+
+# Libellé affiché -> colonne de score (l'ordre fixe celui des pilules et du tableau)
+METRICS = {
+    "Score global": "score_global",
+    "Résultats aux examens": "score_resultats_aux_examens",
+    "Gouvernance & sécurité": "score_gouvernance_securite",
+    "Stratégie & partenariats": "score_strategie_partenariats",
+    "Climat & inclusion": "score_climat_inclusion",
+    "Ouverture linguistique & culturelle": "score_ouverture_linguistique",
+    "Ressources & numérique": "score_ressources_numerique",
+}
+METRIC_COLS = list(METRICS.values())
+DIMENSION_LABELS = {col: label for label, col in METRICS.items() if col in SCORE_TO_WEIGHT}
+
+# Rang réseau et percentile dans le pays du score global : précalculés par add_ranks
+RANKING_COLS = [
+    rank_col("score_global"), "etablissement", COUNTRY_COL, *METRIC_COLS, rank_col("score_global", "pct_pays"),
+]
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+@dataclass(frozen=True)
+class NetworkAggregates:
+    version: str
+    stats: pd.DataFrame           # index = colonne de score : libellé, moyenne, médiane, quartiles, min, max, n
+    order: dict[str, np.ndarray]  # colonne -> positions (int32) triées par score décroissant, sans les manquants
+    countries: list[str]          # pays présents, triés (filtre du classement)
+    country_codes: np.ndarray     # code (int32) du pays de chaque ligne dans `countries`, -1 si absent
+
+    @property
+    def global_mean(self) -> float:
+        return float(self.stats.at["score_global", "moyenne"])
+
+    def dimension_means(self) -> pd.DataFrame:
+        """Moyennes des 6 dimensions (indicateur, valeur), triées par valeur croissante."""
+        dims = self.stats.loc[list(DIMENSION_LABELS), ["libelle", "moyenne"]]
+        return (
+            dims.rename(columns={"libelle": "indicateur", "moyenne": "valeur"})
+            .sort_values("valeur", ascending=True)
+            .reset_index(drop=True)
+        )
+
+
+def _metric_matrix(df: pd.DataFrame) -> np.ndarray:
+    # Colonnes absentes -> NaN : le tableau de bord reste affichable sur une source partielle
+    return np.column_stack([
+        df[col].to_numpy(dtype=np.float64, na_value=np.nan) if col in df.columns else np.full(len(df), np.nan)
+        for col in METRIC_COLS
+    ])
+
+
+def _order(values: np.ndarray) -> np.ndarray:
+    # Tri stable décroissant : à score égal, l'ordre de la source est conservé
+    valid = np.flatnonzero(~np.isnan(values))
+    return valid[np.argsort(-values[valid], kind="stable")].astype(np.int32)
+
+
+def network_aggregates(df: pd.DataFrame, version: str) -> NetworkAggregates:
+    values = _metric_matrix(df)
+    counts = (~np.isnan(values)).sum(axis=0)
+    with warnings.catch_warnings():
+        # nan* avertissent sur une colonne entièrement vide : NaN est le résultat attendu
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q25, median, q75 = np.nanquantile(values, QUANTILES, axis=0)
+        means, mins, maxs = np.nanmean(values, axis=0), np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+    stats = pd.DataFrame({
+        "libelle": list(METRICS),
+        "moyenne": means,
+        "mediane": median,
+        "q25": q25,
+        "q75": q75,
+        "min": mins,
+        "max": maxs,
+        "n": counts,
+    }, index=pd.Index(METRIC_COLS, name="colonne"))
+
+    order = {col: _order(values[:, j]) for j, col in enumerate(METRIC_COLS)}
+    if COUNTRY_COL in df.columns:
+        codes, countries = pd.factorize(df[COUNTRY_COL].astype(object), sort=True)
+    else:
+        codes, countries = np.full(len(df), -1), []
+    return NetworkAggregates(
+        version=version, stats=stats, order=order,
+        countries=[str(c) for c in countries], country_codes=codes.astype(np.int32),
+    )
+
+
+def ranking_rows(
+    aggregates: NetworkAggregates,
+    sort_col: str = "score_global",
+    descending: bool = True,
+    country: str | None = None,
+) -> np.ndarray:
+    """Positions des lignes du classement : ordre précalculé de `sort_col` (sans les manquants), filtré par pays."""
+    rows = aggregates.order[sort_col]
+    if country is not None:
+        rows = rows[aggregates.country_codes[rows] == aggregates.countries.index(country)]
+    return rows if descending else rows[::-1]
+
+
+def ranking_page(df: pd.DataFrame, rows: np.ndarray, page: int = 1, page_size: int = 50) -> pd.DataFrame:
+    """Seules les lignes visibles sont extraites du df, indexées par leur position dans le tri."""
+    start = (max(page, 1) - 1) * page_size
+    cols = [c for c in RANKING_COLS if c in df.columns]
+    visible = df[cols].take(rows[start:start + page_size])
+    return visible.set_axis(pd.RangeIndex(start + 1, start + 1 + len(visible), name="#"))
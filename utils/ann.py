@@ -0,0 +1,92 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from utils.ocr_index import OcrIndex
+from utils.retrieval import top_k_indices
+
+
+# En dessous de cette taille, le balayage exact est aussi rapide et sans perte de rappel
+ANN_MIN_CHUNKS = 50_000
+# Nombre de listes inspectées par requête : le curseur rappel / latence
+DEFAULT_NPROBE = 8
+TRAIN_SAMPLE = 100_000  # chunks tirés pour entraîner les centroïdes
+
+
+@dataclass(frozen=True)
+class IvfIndex:
+    """
+    Index à listes inversées (IVF) : chaque chunk est rangé dans la liste de son centroïde
+    le plus proche ; une requête ne parcourt que les `nprobe` listes les plus proches.
+    """
+    centroids: np.ndarray  # (n_lists, d) float32 normalisés
+    order: np.ndarray      # positions des chunks, regroupées par liste
+    offsets: np.ndarray    # (n_lists + 1,) début de chaque liste dans `order`
+    version: str           # version de l'OcrIndex source
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+
+def build_ivf(index: OcrIndex, n_lists: int | None = None, seed: int = 0) -> IvfIndex:
+    n = len(index)
+    n_lists = n_lists or max(1, int(4 * np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False))
+
+    km = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, batch_size=4096, n_init=3)
+    km.fit(np.asarray(index.embeddings[sample]))
+
+    labels = np.empty(n, dtype=np.int32)
+    for start in range(0, n, 65_536):  # par blocs pour ne pas charger tout le memmap
+        labels[start:start + 65_536] = km.predict(np.asarray(index.embeddings[start:start + 65_536]))
+
+    centroids = km.cluster_centers_.astype(np.float32)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    counts = np.bincount(labels, minlength=n_lists)
+    return IvfIndex(
+        centroids=centroids / norms,
+        order=np.argsort(labels, kind="stable").astype(np.int64),
+        offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        version=index.version,
+    )
+
+
+def save_ivf(ivf: IvfIndex, path: Path) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(tmp, centroids=ivf.centroids, order=ivf.order, offsets=ivf.offsets, version=ivf.version)
+    tmp.replace(path)
+
+
+def load_ivf(path: Path) -> IvfIndex:
+    with np.load(path) as f:
+        return IvfIndex(f["centroids"], f["order"], f["offsets"], str(f["version"]))
+
+
+def load_or_build_ivf(index: OcrIndex, n_lists: int | None = None) -> IvfIndex:
+    """IVF persisté à côté de l'index (même version) ; construit au premier appel."""
+    path = index.path / "ivf.npz" if index.path is not None else None
+    if path is not None and path.exists():
+        ivf = load_ivf(path)
+        if ivf.version == index.version and (n_lists is None or ivf.n_lists == n_lists):
+            return ivf
+    ivf = build_ivf(index, n_lists)
+    if path is not None:
+        save_ivf(ivf, path)
+    return ivf
+
+
+def search_ivf(
+    index: OcrIndex, ivf: IvfIndex, q: np.ndarray, top_k: int, nprobe: int = DEFAULT_NPROBE
+) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k approché : (positions des chunks, scores), q déjà normalisé."""
+    lists = top_k_indices(ivf.centroids @ q, min(nprobe, ivf.n_lists))
+    candidates = np.sort(np.concatenate(
+        [ivf.order[ivf.offsets[l]:ivf.offsets[l + 1]] for l in lists]
+    ))
+    scores = index.embeddings[candidates] @ q
+    best = top_k_indices(scores, top_k)
+    return candidates[best], scores[best]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from utils.embeddings import normalize_text
+
+
+SIMILARITY_THRESHOLD = 0.95   # cosinus minimal entre deux questions jugées équivalentes
+TTL = 7 * 24 * 3600           # secondes
+MAX_ENTRIES = 5000
+
+
+class AnswerCache:
+    """
+    Cache persistant (SQLite) des réponses générées. Une réponse est réutilisée si :
+      - même version d'index OCR,
+      - mêmes établissements détectés et mêmes chunks retrouvés,
+      - question quasi identique (cosinus des embeddings ≥ seuil, ou texte normalisé
+        identique quand la recherche a tourné sans embedding).
+    Expiration par TTL, éviction des entrées les moins récemment servies au-delà de max_entries.
+    """
+
+    def __init__(self, path: Path, index_version: str, threshold: float = SIMILARITY_THRESHOLD,
+                 ttl: float = TTL, max_entries: int = MAX_ENTRIES):
+        self.index_version = index_version
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                index_version TEXT, scope TEXT, chunks TEXT, query TEXT, query_emb BLOB,
+                answer TEXT, created REAL, last_used REAL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers (index_version, scope, chunks)")
+        # Les réponses construites sur une autre version de l'index ne sont plus valides
+        self._db.execute("DELETE FROM answers WHERE index_version != ?", (index_version,))
+        self._db.commit()
+
+    @staticmethod
+    def _key(etabs: list[str], chunks: list[int]) -> tuple[str, str]:
+        return "|".join(sorted(etabs)), ",".join(map(str, sorted(chunks)))
+
+    def get(self, query: str, query_emb, etabs: list[str], chunks: list[int]) -> str | None:
+        scope, chunk_key = self._key(etabs, chunks)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, query, query_emb, answer FROM answers "
+                "WHERE index_version = ? AND scope = ? AND chunks = ? AND created >= ?",
+                (self.index_version, scope, chunk_key, time.time() - self.ttl),
+            ).fetchall()
+            found = None
+            for rowid, cached_query, cached_emb, answer in rows:
+                if self._same_question(query, query_emb, cached_query, cached_emb):
+                    found = (rowid, answer)
+                    break
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE answers SET last_used = ? WHERE rowid = ?", (time.time(), found[0]))
+            self._db.commit()
+            return found[1]
+
+    def _same_question(self, query: str, query_emb, cached_query: str, cached_emb: bytes | None) -> bool:
+        if query_emb is None or cached_emb is None:
+            return normalize_text(query) == cached_query
+        a = np.asarray(query_emb, dtype=np.float32)
+        b = np.frombuffer(cached_emb, dtype=np.float32)
+        denom = np.linalg.norm(a) * np.linalg.norm(b)
+        return bool(denom) and float(a @ b / denom) >= self.threshold
+
+    def put(self, query: str, query_emb, etabs: list[str], chunks: list[int], answer: str) -> None:
+        scope, chunk_key = self._key(etabs, chunks)
+        emb = None if query_emb is None else np.asarray(query_emb, dtype=np.float32).tobytes()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.index_version, scope, chunk_key, normalize_text(query), emb, answer, now, now),
+            )
+            self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
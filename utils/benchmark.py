@@ -0,0 +1,192 @@
+"""
+Banc d'essai hors ligne de la recherche Q&A : qualité (recall@k, MRR) et latence
+(p50 / p95 / p99) de chaque backend sur un index synthétique reproductible.
+
+    python -m utils.benchmark --chunks 50000 --dim 384 --queries 300
+    python -m utils.benchmark --backends exact ivf --nprobe 4 16 --json resultats.json
+
+Aucun appel réseau : les embeddings de requête viennent d'un stub déterministe.
+Le rapport couvre aussi la détection d'établissements (EtabMatcher) et le
+constructeur de contexte (pack_context).
+"""
+from __future__ import annotations
+import argparse
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils import retrieval
+from utils.context import pack_context
+from utils.embeddings import HashingEmbeddings
+from utils.matcher import EtabMatcher
+from utils.ocr_index import OcrIndex, _normalize_rows, open_index, write_index
+
+
+BACKENDS = ["exact", "ivf", "lexical", "hybrid", "scoped"]
+
+
+@dataclass(frozen=True)
+class Query:
+    text: str
+    doc: str
+    relevant: int  # chunk d'origine de la requête
+
+
+class StubEmbeddings:
+    """Embeddings de requête déterministes : table précalculée, hachage pour le reste."""
+
+    def __init__(self, table: dict[str, np.ndarray], dim: int):
+        self.table = table
+        self.fallback = HashingEmbeddings(dim)
+        self.model = "stub"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return np.vstack([self.table[t] if t in self.table else self.fallback.embed([t])[0] for t in texts])
+
+
+def synthetic_corpus(n_chunks: int, dim: int, n_docs: int, n_topics: int = 64, n_queries: int = 200,
+                     noise: float = 0.6, seed: int = 0) -> tuple[OcrIndex, list[Query], StubEmbeddings, Path]:
+    """
+    Index synthétique : chaque chunk = centroïde de son thème + bruit, texte = mots du thème
+    + deux mots propres. Chaque requête reprend les mots propres d'un chunk tiré au hasard,
+    dont l'embedding est légèrement bruité ; ce chunk est la réponse attendue.
+    """
+    rng = np.random.default_rng(seed)
+    docs = np.array([f"etablissement_{i:04d}" for i in range(n_docs)])
+    topics = rng.integers(0, n_topics, n_chunks)
+    centroids = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    embeddings = _normalize_rows(centroids[topics] + noise * rng.standard_normal((n_chunks, dim), dtype=np.float32))
+
+    vocab = np.array([f"terme{i}" for i in range(max(1000, n_chunks // 4))])
+    own = rng.choice(len(vocab), size=(n_chunks, 2))
+    doc_of = np.sort(rng.integers(0, n_docs, n_chunks))
+    texts = [f"theme{t} rubrique{t} {vocab[a]} {vocab[b]} texte de rapport"
+             for t, (a, b) in zip(topics, own)]
+    encoded = [t.encode() for t in texts]
+    ends = np.cumsum([len(b) for b in encoded])
+    meta = pd.DataFrame({
+        "doc": pd.Categorical(docs[doc_of]),
+        "page": (np.arange(n_chunks) % 40).astype(np.int32),
+        "text_start": ends - np.array([len(b) for b in encoded]),
+        "text_end": ends,
+    })
+    tmp = Path(tempfile.mkdtemp(prefix="mlf_bench_"))
+    index = open_index(write_index(meta, embeddings, b"".join(encoded), tmp))
+
+    table, queries = {}, []
+    for c in rng.choice(n_chunks, size=min(n_queries, n_chunks), replace=False):
+        doc = str(index.meta["doc"].iat[c])
+        a, b = own[c]
+        text = f"que disent les rapports de {doc.replace('_', ' ')} sur {vocab[a]} {vocab[b]} ?"
+        q = index.embeddings[c] + 0.3 * noise * rng.standard_normal(dim).astype(np.float32)
+        table[text] = q / np.linalg.norm(q)
+        queries.append(Query(text, doc, int(c)))
+    return index, queries, StubEmbeddings(table, dim), tmp
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    ms = np.array(latencies) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99))}
+
+
+def run(index: OcrIndex, queries: list[Query], embedder: StubEmbeddings, backends: list[str],
+        k: int = 5, nprobes: tuple[int, ...] = (8,)) -> pd.DataFrame:
+    rows = []
+    query_embs = [embedder.embed([q.text])[0] for q in queries]
+    matcher = EtabMatcher(index.docs)
+
+    runners = {}
+    if "exact" in backends:
+        runners["exact"] = lambda q, e: retrieval.search(index, e, top_k=k)
+    if "ivf" in backends:
+        from utils.ann import build_ivf, search_ivf
+        t0 = time.perf_counter()
+        ivf = build_ivf(index)
+        rows.append({"backend": "ivf (construction)", "build_s": time.perf_counter() - t0})
+        for nprobe in nprobes:
+            # ANN_MIN_CHUNKS ignoré ici : on mesure l'IVF quelle que soit la taille
+            runners[f"ivf nprobe={nprobe}"] = lambda q, e, n=nprobe: retrieval.hits(
+                index, *search_ivf(index, ivf, retrieval.normalize(e), k, n)
+            )
+    if {"lexical", "hybrid"} & set(backends):
+        from utils.lexical import build_lexical
+        t0 = time.perf_counter()
+        lexical = build_lexical(index)
+        rows.append({"backend": "lexical (construction)", "build_s": time.perf_counter() - t0})
+        if "lexical" in backends:
+            runners["lexical"] = lambda q, e: retrieval.hybrid_search(index, q.text, None, lexical, top_k=k)
+        if "hybrid" in backends:
+            runners["hybrid"] = lambda q, e: retrieval.hybrid_search(index, q.text, e, lexical, top_k=k)
+    if "scoped" in backends:
+        runners["scoped"] = lambda q, e: retrieval.search(index, e, etab=matcher.find_all(q.text) or None, top_k=k)
+
+    for name, fn in runners.items():
+        fn(queries[0], query_embs[0])  # échauffement (pages du memmap, caches)
+        latencies, reciprocal, found = [], [], []
+        for q, e in zip(queries, query_embs):
+            t0 = time.perf_counter()
+            hits = fn(q, e)
+            latencies.append(time.perf_counter() - t0)
+            ranked = [h.chunk for h in hits]
+            rank = ranked.index(q.relevant) + 1 if q.relevant in ranked else None
+            found.append(rank is not None)
+            reciprocal.append(1 / rank if rank else 0.0)
+        rows.append({"backend": name, f"recall@{k}": float(np.mean(found)), "mrr": float(np.mean(reciprocal)),
+                     **_percentiles(latencies)})
+
+    # Détection d'établissements : exactitude et latence
+    latencies, correct = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        found_docs = matcher.find_all(q.text)
+        latencies.append(time.perf_counter() - t0)
+        correct.append(found_docs == [q.doc])
+    rows.append({"backend": "detection etab", "accuracy": float(np.mean(correct)), **_percentiles(latencies)})
+
+    # Constructeur de contexte sur un pool de 20 chunks
+    latencies, tokens = [], []
+    for q, e in zip(queries, query_embs):
+        pool = retrieval.search(index, e, top_k=20)
+        t0 = time.perf_counter()
+        packed = pack_context(index, pool, e)
+        latencies.append(time.perf_counter() - t0)
+        tokens.append(packed.tokens)
+    rows.append({"backend": "pack_context", "tokens_moyens": float(np.mean(tokens)), **_percentiles(latencies)})
+    return pd.DataFrame(rows).set_index("backend")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="écrit aussi le rapport en JSON")
+    args = parser.parse_args(argv)
+
+    index, queries, embedder, tmp = synthetic_corpus(
+        args.chunks, args.dim, args.docs, n_queries=args.queries, seed=args.seed
+    )
+    n_chunks = len(index)
+    try:
+        report = run(index, queries, embedder, args.backends, args.k, tuple(args.nprobe))
+    finally:
+        del index
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"Index synthétique : {n_chunks} chunks × {args.dim} dims, {args.docs} établissements, "
+          f"{len(queries)} requêtes")
+    print(report.round(4).to_string())
+    if args.json:
+        args.json.write_text(report.reset_index().to_json(orient="records", force_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
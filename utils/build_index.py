@@ -0,0 +1,208 @@
+"""
+Construction incrémentale de l'index OCR lu par load_index (colonnes doc, page, text, embedding).
+
+Entrée : un tableau de pages (CSV, JSONL ou Parquet) avec les colonnes doc, page, text.
+Chaque page est découpée en chunks puis embarquée par lots, en parallèle. Une empreinte
+par page (texte + paramètres de découpage + modèle) permet de ne ré-embarquer que les pages
+nouvelles ou modifiées ; chaque exécution publie une nouvelle version index-vN.parquet.
+Si le modèle (ou la dimension) change, les chunks conservés des pages absentes de l'entrée
+sont ré-embarqués depuis leur texte stocké : un index ne mélange jamais deux espaces vectoriels.
+
+    python -m utils.build_index pages.jsonl --out index/ --workers 8
+    python -m utils.build_index pages.jsonl --out index/ --base-url http://127.0.0.1:8001/v1   # serveur local
+    python -m utils.build_index pages.jsonl --out index/ --provider hashing                      # hors ligne
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils.embeddings import DEFAULT_MODEL, EmbeddingProvider, HashingEmbeddings, OpenAIEmbeddings
+
+
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+BATCH_SIZE = 64
+WORKERS = 4
+RETRIES = 3
+MANIFEST = "manifest.json"
+
+
+def read_pages(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    elif path.suffix in (".jsonl", ".ndjson"):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+    missing = {"doc", "page", "text"} - set(df.columns)
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans {path} : {sorted(missing)}")
+    return df[["doc", "page", "text"]].assign(text=df["text"].fillna("").astype(str))
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Découpe en fenêtres d'environ `size` caractères, coupées sur un espace, avec recouvrement."""
+    text = " ".join(text.split())
+    if len(text) <= size:
+        return [text] if text else []
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            end = cut if cut > 0 else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def page_hash(doc, page, text: str, params: dict) -> str:
+    payload = json.dumps([str(doc), str(page), text, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def page_keys(df: pd.DataFrame) -> pd.Series:
+    """Clé "doc|page" d'une page, commune au manifeste et aux index successifs."""
+    return df["doc"].astype(str) + "|" + df["page"].astype(str)
+
+
+def merge_duplicate_pages(pages: pd.DataFrame) -> pd.DataFrame:
+    """Une ligne par (doc, page) : les textes d'une même page (OCR en plusieurs blocs) sont concaténés dans l'ordre."""
+    if not pages.duplicated(["doc", "page"]).any():
+        return pages
+    return (
+        pages.groupby(["doc", "page"], sort=False, as_index=False)["text"]
+        .agg("\n".join)
+    )
+
+
+def embed_all(provider: EmbeddingProvider, texts: list[str], batch_size: int = BATCH_SIZE,
+              workers: int = WORKERS) -> np.ndarray:
+    """Embeddings par lots, répartis sur un pool de threads ; chaque lot est retenté avant d'échouer."""
+    def run(batch: list[str]) -> np.ndarray:
+        for attempt in range(RETRIES):
+            try:
+                return provider.embed(batch)
+            except Exception:
+                if attempt == RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return np.vstack(list(pool.map(run, batches))).astype(np.float32)
+
+
+def _embedding_dim(df: pd.DataFrame) -> int | None:
+    return len(df["embedding"].iat[0]) if len(df) else None
+
+
+def load_manifest(out_dir: Path) -> dict:
+    path = out_dir / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {"version": 0, "pages": {}}
+
+
+def build(pages: pd.DataFrame, out_dir: Path, provider: EmbeddingProvider,
+          chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP,
+          batch_size: int = BATCH_SIZE, workers: int = WORKERS) -> dict:
+    """
+    Met à jour l'index versionné de `out_dir` avec `pages` et renvoie un résumé.
+    Les pages absentes de l'entrée sont conservées (ajout de rapports sans tout reconstruire).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    params = {"chunk_chars": chunk_chars, "overlap": overlap, "model": provider.model}
+
+    previous = None
+    if manifest["version"]:
+        previous = pd.read_parquet(out_dir / f"index-v{manifest['version']}.parquet")
+
+    pages = merge_duplicate_pages(pages[["doc", "page", "text"]])
+    keys = page_keys(pages)
+    hashes = pd.Series(
+        [page_hash(d, p, t, params) for d, p, t in pages.itertuples(index=False)], index=pages.index
+    )
+    changed = pages[hashes != keys.map(manifest["pages"])]
+
+    rows = [(d, p, c) for d, p, t in changed.itertuples(index=False)
+            for c in chunk_text(t, chunk_chars, overlap)]
+    embeddings = embed_all(provider, [c for _, _, c in rows], batch_size, workers)
+    fresh = pd.DataFrame({
+        "doc": [d for d, _, _ in rows],
+        "page": [p for _, p, _ in rows],
+        "text": [c for _, _, c in rows],
+        "embedding": list(embeddings) if rows else [],
+    }).astype({"page": pages["page"].dtype})  # sinon un lot vide passe `page` en float ("1.0" ≠ "1")
+
+    carried_embedded = 0
+    if previous is not None:
+        carried = previous[~page_keys(previous).isin(set(page_keys(changed)))]
+        prev_dim = _embedding_dim(carried)
+        if len(carried) and (
+            manifest.get("params", {}).get("model") != provider.model
+            or (rows and prev_dim != embeddings.shape[1])
+        ):
+            # Autre modèle : les vecteurs conservés ne sont plus comparables, on les recalcule
+            carried = carried.assign(embedding=list(embed_all(provider, carried["text"].tolist(),
+                                                              batch_size, workers)))
+            carried_embedded = len(carried)
+        index = pd.concat([carried, fresh], ignore_index=True)
+    else:
+        index = fresh
+    index = index.sort_values(["doc", "page"], kind="stable").reset_index(drop=True)
+    dims = index["embedding"].map(len).unique()
+    if len(dims) > 1:
+        raise ValueError(f"Dimensions d'embedding incohérentes dans l'index : {sorted(dims)}")
+
+    version = manifest["version"] + 1
+    tmp = out_dir / f".index-v{version}.parquet.tmp"
+    index.to_parquet(tmp, index=False)
+    os.replace(tmp, out_dir / f"index-v{version}.parquet")
+    manifest = {
+        "version": version,
+        "params": {**params, "dim": int(dims[0]) if len(dims) else None},
+        "pages": {**manifest["pages"], **dict(zip(keys, hashes))},
+    }
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=1))
+
+    return {"version": version, "pages": len(pages), "pages_embedded": len(changed),
+            "chunks_embedded": len(rows) + carried_embedded, "chunks_total": len(index)}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", type=Path, help="tableau doc, page, text (.csv, .jsonl, .parquet)")
+    parser.add_argument("--out", type=Path, required=True, help="répertoire de l'index versionné")
+    parser.add_argument("--provider", choices=["openai", "hashing"], default="openai")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    args = parser.parse_args(argv)
+
+    if args.provider == "hashing":
+        provider = HashingEmbeddings()
+    else:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "local"), base_url=args.base_url)
+        provider = OpenAIEmbeddings(client, args.model)
+
+    summary = build(read_pages(args.pages), args.out, provider, args.chunk_chars, args.overlap,
+                    args.batch_size, args.workers)
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
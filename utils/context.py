@@ -0,0 +1,108 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+from utils.ocr_index import OcrIndex
+from utils.retrieval import Hit, normalize
+
+try:  # comptage exact si tiktoken est installé, estimation sinon
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+
+CONTEXT_TOKEN_BUDGET = 2500  # tokens d'extraits envoyés au modèle
+POOL_SIZE = 20               # chunks retrouvés avant sélection
+DEDUP_THRESHOLD = 0.97       # cosinus au-delà duquel deux chunks sont des doublons
+MMR_LAMBDA = 0.7             # 1 = pertinence seule, 0 = diversité seule
+MAX_CHUNK_TOKENS = 400       # plafond par chunk, pour qu'un seul chunk ne prenne pas tout le budget
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, len(text) // 4)  # ~4 caractères par token en français
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text)[:max_tokens]) + "…"
+    return text[: max_tokens * 4] + "…"
+
+
+@dataclass(frozen=True)
+class PackedContext:
+    text: str
+    hits: list[Hit]  # chunks retenus, dans l'ordre de sélection
+    tokens: int
+
+
+def _select_mmr(vectors: np.ndarray, relevance: np.ndarray, costs: list[int], budget: int,
+                lambda_: float, dedup: float) -> list[int]:
+    """MMR sous contrainte de budget ; les quasi-doublons d'un chunk déjà retenu sont écartés."""
+    selected: list[int] = []
+    remaining = list(range(len(relevance)))
+    max_sim = np.full(len(relevance), -np.inf)
+    spent = 0
+    while remaining:
+        redundancy = np.where(np.isfinite(max_sim[remaining]), max_sim[remaining], 0.0)
+        mmr = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        best = remaining[int(np.argmax(mmr))]
+        remaining.remove(best)
+        if max_sim[best] >= dedup or spent + costs[best] > budget:
+            continue
+        selected.append(best)
+        spent += costs[best]
+        max_sim = np.maximum(max_sim, vectors @ vectors[best])
+    return selected
+
+
+def _merge_adjacent(hits: list[Hit], texts: dict[int, str]) -> list[str]:
+    """Regroupe les pages consécutives d'un même document en un seul bloc référencé."""
+    blocks = []
+    ordered = sorted(hits, key=lambda h: (h.doc, h.page, h.chunk))
+    i = 0
+    while i < len(ordered):
+        group = [ordered[i]]
+        while i + 1 < len(ordered) and ordered[i + 1].doc == group[-1].doc \
+                and ordered[i + 1].page - group[-1].page <= 1:
+            i += 1
+            group.append(ordered[i])
+        first, last = group[0].page, group[-1].page
+        pages = f"p.{first}" if first == last else f"p.{first}-{last}"
+        blocks.append(f"[{group[0].doc}, {pages}] " + " ".join(texts[h.chunk] for h in group))
+        i += 1
+    return blocks
+
+
+def pack_context(
+    index: OcrIndex,
+    hits: list[Hit],
+    query_emb=None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    lambda_: float = MMR_LAMBDA,
+    dedup: float = DEDUP_THRESHOLD,
+) -> PackedContext:
+    """
+    Contexte du prompt sous budget de tokens : dédoublonnage des chunks quasi identiques,
+    sélection MMR (pertinence vs diversité) sur les embeddings normalisés de l'index,
+    puis fusion des pages adjacentes d'un même document.
+    """
+    if not hits:
+        return PackedContext("", [], 0)
+    chunks = np.array([h.chunk for h in hits])
+    vectors = np.asarray(index.embeddings[np.sort(chunks)])[np.argsort(np.argsort(chunks))]
+    if query_emb is not None:
+        relevance = vectors @ normalize(query_emb)
+    else:  # scores lexicaux / RRF non comparables aux cosinus : on garde l'ordre du classement
+        relevance = 1.0 - np.arange(len(hits)) / len(hits)
+
+    texts = {h.chunk: _truncate(h.text, MAX_CHUNK_TOKENS) for h in hits}
+    costs = [count_tokens(texts[h.chunk]) + 8 for h in hits]  # + référence [doc, p.x]
+    keep = _select_mmr(vectors, relevance, costs, budget, lambda_, dedup)
+
+    kept = [hits[i] for i in keep]
+    text = "\n\n".join(_merge_adjacent(kept, texts))
+    return PackedContext(text, kept, count_tokens(text))
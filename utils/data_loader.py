@@ -1,45 +1,41 @@
 from __future__ import annotations
 import pandas as pd
 import streamlit as st
+from utils.fetch import CACHE_DIR, fetch_csv
+from utils.schema import apply_schema
+from utils.ocr_index import OcrIndex, materialize_index
 
 
 CSV_EXPORT = "https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+DRIVE_EXPORT = "https://drive.google.com/uc?id={file_id}&export=download"
 
-
-@st.cache_data(show_spinner=False)
-def load_data() -> pd.DataFrame:
+def sheet_url() -> str:
     sheet_id = st.secrets["load_csv"]["sheet_id"]
     gid = st.secrets["load_csv"]["gid"]
-
     if not sheet_id:
-        st.error("sheet_id manquant dans .streamlit/secrets.toml")
-        st.stop()
-    url = CSV_EXPORT.format(sheet_id=sheet_id, gid=gid)
-    df = pd.read_csv(url)
-    # Normalisation colonnes
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_").str.replace("/", "_")
+        raise ValueError("sheet_id manquant dans .streamlit/secrets.toml")
+    return CSV_EXPORT.format(sheet_id=sheet_id, gid=gid)
+
 
+def fetch_data() -> tuple[pd.DataFrame, str]:
+    """Chargement non mis en cache par Streamlit (utilisé par le rafraîchissement en arrière-plan)."""
+    df, source = fetch_csv(sheet_url())
+    return apply_schema(df), source
 
-    # Normalisation des noms de colonnes
-    df.columns = (
-    df.columns
-    .str.strip().str.lower()
-    .str.replace(" ", "_", regex=False)
-    .str.replace("/", "_", regex=False)
-    )
 
-    return df
+def index_url() -> str:
+    # ID Drive lu à l'appel (et non à l'import) : le module s'importe sans secrets.toml
+    return DRIVE_EXPORT.format(file_id=st.secrets["ocr_index"]["drive_file_id"])
 
 
-# Récupérer ID Drive depuis secrets
-FILE_ID = st.secrets["ocr_index"]["drive_file_id"]
-URL = f"https://drive.google.com/uc?id={FILE_ID}&export=download"
+INDEX_TTL = 6 * 3600  # secondes ; l'index OCR change rarement mais ne doit pas rester figé
 
-@st.cache_data(show_spinner=False)
-def load_index():
+# cache_resource (et non cache_data) : l'index mappé en mémoire ne doit pas être copié par session
+@st.cache_resource(show_spinner=False, ttl=INDEX_TTL)
+def load_index() -> OcrIndex:
     try:
-        df_index=pd.read_parquet(URL)
-        return df_index
+        df_index = pd.read_parquet(index_url())
+        return materialize_index(df_index, CACHE_DIR / "ocr_index")
     except Exception as e:
         st.error(f"Impossible de charger l’index OCR depuis Drive : {e}")
         st.stop()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Protocol
+import numpy as np
+
+
+DEFAULT_MODEL = "text-embedding-3-small"
+
+
+class EmbeddingProvider(Protocol):
+    """Tout ce qui transforme une liste de textes en matrice (n, d) float32."""
+    model: str
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+class OpenAIEmbeddings:
+    def __init__(self, client, model: str = DEFAULT_MODEL, timeout: float | None = None):
+        self.client = client if timeout is None else client.with_options(timeout=timeout, max_retries=1)
+        self.model = model
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+
+
+class HashingEmbeddings:
+    """
+    Remplaçant local et déterministe (tests, benchmarks hors ligne) : sac de mots
+    projeté par hachage signé dans `dim` composantes, normalisé L2.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in re.findall(r"\w+", normalize_text(text)):
+                h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+                out[i, h % self.dim] += 1.0 if h >> 63 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+def normalize_text(text: str) -> str:
+    """Clé de cache : Unicode NFKC, minuscules, espaces réduits."""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+class CachedEmbeddings:
+    """
+    Cache d'embeddings devant un fournisseur : LRU en mémoire + table SQLite sur disque,
+    clé = (modèle, texte normalisé). Seuls les textes absents sont envoyés au fournisseur,
+    en un seul appel.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, path: Path | None = None, maxsize: int = 2048):
+        self.provider = provider
+        self.model = provider.model
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, key TEXT, vec BLOB, PRIMARY KEY (model, key))"
+            )
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [normalize_text(t) for t in texts]
+        found = {k: v for k in set(keys) if (v := self._get(k)) is not None}
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        with self._lock:
+            self.hits += len(keys) - sum(k in missing for k in keys)
+            self.misses += len(missing)
+        if missing:
+            vectors = self.provider.embed(missing)
+            for k, v in zip(missing, vectors):
+                found[k] = v
+                self._put(k, v)
+        return np.vstack([found[k] for k in keys]).astype(np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+    def _get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT vec FROM embeddings WHERE model = ? AND key = ?", (self.model, key)
+            ).fetchone()
+        if row is None:
+            return None
+        vec = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, vec)
+        return vec
+
+    def _put(self, key: str, vec: np.ndarray) -> None:
+        vec = np.asarray(vec, dtype=np.float32)
+        self._remember(key, vec)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", (self.model, key, vec.tobytes())
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        with self._lock:
+            self._lru[key] = vec
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
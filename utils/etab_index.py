@@ -0,0 +1,81 @@
+"""
+Index des établissements de la fiche, construit une fois par version des données :
+identifiant stable, libellé du sélecteur, position de la ligne et moyennes réseau.
+"""
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from utils.scoring import RANKED_COLS, SCORE_TO_WEIGHT
+
+LABEL_COLS = ("etablissement", "ville", "pays")
+# Départage des homonymes (même libellé) : colonnes qui identifient un site et changent rarement.
+# Seuls des homonymes identiques sur toutes ces colonnes restent numérotés selon l'ordre des lignes.
+HOMONYM_KEYS = ("latitude", "longitude", "niveau_max")
+
+
+@dataclass(frozen=True)
+class EtabIndex:
+    options: list[str]           # identifiants triés par libellé (ordre du sélecteur)
+    labels: dict[str, str]       # identifiant -> "etablissement – ville (pays)"
+    positions: dict[str, int]    # identifiant -> position de la ligne dans le df
+    network_means: dict[str, float]  # colonne de score -> moyenne réseau
+    network_counts: dict[str, int]   # colonne de score -> nombre d'établissements notés (dénominateur du rang)
+    version: str
+
+    def __len__(self) -> int:
+        return len(self.options)
+
+    def label(self, etab_id: str) -> str:
+        return self.labels[etab_id]
+
+    def row(self, df: pd.DataFrame, etab_id: str) -> pd.Series:
+        return df.iloc[self.positions[etab_id]]
+
+
+def _text(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series("—", index=df.index, dtype=object)
+    return df[col].astype(object).where(df[col].notna(), "—").astype(str)
+
+
+def etab_labels(df: pd.DataFrame) -> pd.Series:
+    """
+    Libellés uniques : les homonymes (même nom, ville et pays) sont numérotés dans l'ordre
+    de HOMONYM_KEYS, et non dans l'ordre des lignes : le numéro (donc l'identifiant) ne
+    change pas si la source réordonne ses lignes.
+    """
+    etab, ville, pays = (_text(df, c) for c in LABEL_COLS)
+    labels = etab + " – " + ville + " (" + pays + ")"
+    if not labels.duplicated().any():
+        return labels
+    keys = pd.DataFrame({"label": labels, **{c: _text(df, c) for c in HOMONYM_KEYS if c in df.columns}})
+    keys["pos"] = np.arange(len(df))
+    ordered = keys.sort_values(list(keys.columns), kind="stable")
+    rank = ordered.groupby("label", sort=False).cumcount().reindex(labels.index)
+    return labels.where(rank == 0, labels + " #" + (rank + 1).astype(str))
+
+
+def _stable_id(label: str) -> str:
+    # Ne dépend que du libellé : la sélection survit à un rechargement des données,
+    # y compris pour les homonymes tant que leurs HOMONYM_KEYS diffèrent
+    return hashlib.blake2b(label.encode(), digest_size=8).hexdigest()
+
+
+def etab_index(df: pd.DataFrame, version: str) -> EtabIndex:
+    labels = etab_labels(df).to_numpy()
+    ids = [_stable_id(label) for label in labels]
+    order = np.argsort(labels, kind="stable")
+    means = {}
+    for col in SCORE_TO_WEIGHT:
+        s = pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(dtype=float)
+        means[col] = float(s.mean()) if s.notna().any() else float("nan")
+    return EtabIndex(
+        options=[ids[i] for i in order],
+        labels=dict(zip(ids, labels)),
+        positions={etab_id: pos for pos, etab_id in enumerate(ids)},
+        network_means=means,
+        network_counts={col: int(df[col].notna().sum()) if col in df.columns else 0 for col in RANKED_COLS},
+        version=version,
+    )
@@ -0,0 +1,101 @@
+"""
+Serveur local imitant les routes OpenAI utilisées par l'application, pour les tests
+et le travail hors ligne :
+  - POST /v1/embeddings        : embeddings déterministes (HashingEmbeddings)
+  - POST /v1/chat/completions  : réponse factice, en streaming SSE si "stream": true
+
+    python -m utils.fake_openai --port 8001 --delay 0.05
+
+puis `OPENAI_BASE_URL = "http://127.0.0.1:8001/v1"` dans la section [KEY] de secrets.toml.
+"""
+from __future__ import annotations
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.embeddings import HashingEmbeddings
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    delay = 0.0     # pause entre deux fragments streamés (secondes)
+    dim = 256       # dimension des embeddings factices
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/embeddings"):
+            self._embeddings(body)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self.send_error(404)
+
+    def _json(self, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _embeddings(self, body: dict) -> None:
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        vectors = HashingEmbeddings(self.dim).embed(texts)
+        self._json({
+            "object": "list",
+            "model": body.get("model", ""),
+            "data": [{"object": "embedding", "index": i, "embedding": v.tolist()} for i, v in enumerate(vectors)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    def _chat(self, body: dict) -> None:
+        last = body.get("messages", [{}])[-1].get("content", "")
+        answer = f"Réponse simulée ({len(last)} caractères de contexte reçus)."
+        base = {"id": "fake", "created": int(time.time()), "model": body.get("model", "")}
+        if not body.get("stream"):
+            self._json({**base, "object": "chat.completion", "choices": [{
+                "index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop",
+            }], "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.delay)
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [{
+                "index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}, "finish_reason": None,
+            }]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        done = {**base, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port: int = 0, delay: float = 0.0, dim: int = 256) -> ThreadingHTTPServer:
+    handler = type("Handler", (FakeOpenAIHandler,), {"delay": delay, "dim": dim})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def serve(port: int = 0, delay: float = 0.0, dim: int = 256) -> ThreadingHTTPServer:
+    """Démarre le serveur dans un thread ; `server.server_port` donne le port réel."""
+    server = make_server(port, delay, dim)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+    server = make_server(args.port, args.delay, args.dim)
+    print(f"Faux serveur OpenAI sur http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
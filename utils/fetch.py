@@ -0,0 +1,79 @@
+"""
+Téléchargement du CSV de la feuille avec requête conditionnelle et instantané local.
+Sans dépendance à Streamlit : importable et testable hors de l'application
+(ex. contre un serveur HTTP local).
+"""
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+import pandas as pd
+
+
+# Instantané local (Parquet + validateurs HTTP), réutilisé entre redémarrages
+CACHE_DIR = Path(os.environ.get("MLF_CACHE_DIR", ".cache"))
+FETCH_TIMEOUT = 15  # secondes avant de se rabattre sur l'instantané
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = (
+    df.columns
+    .str.strip().str.lower()
+    .str.replace(" ", "_", regex=False)
+    .str.replace("/", "_", regex=False)
+    )
+    return df
+
+
+def fetch_csv(url: str, cache_dir: Path = CACHE_DIR, timeout: float = FETCH_TIMEOUT) -> tuple[pd.DataFrame, str]:
+    """
+    Télécharge un CSV avec requête conditionnelle (ETag / Last-Modified) et instantané Parquet local.
+    Retourne (df, source) avec source parmi :
+      - "download"     : contenu nouveau, parsé puis mis en cache
+      - "not_modified" : 304, l'instantané est relu sans parser le CSV
+      - "snapshot"     : source lente ou indisponible, l'instantané (potentiellement ancien) est servi
+    Sans instantané, les erreurs réseau sont propagées.
+    """
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    data_path = cache_dir / f"{key}.parquet"
+    meta_path = cache_dir / f"{key}.json"
+    meta = json.loads(meta_path.read_text()) if data_path.exists() and meta_path.exists() else {}
+
+    req = urllib.request.Request(url)
+    if meta.get("etag"):
+        req.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        req.add_header("If-Modified-Since", meta["last_modified"])
+
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read()
+            headers = resp.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and data_path.exists():
+            return pd.read_parquet(data_path), "not_modified"
+        if data_path.exists():
+            return pd.read_parquet(data_path), "snapshot"
+        raise
+    except (urllib.error.URLError, TimeoutError, OSError):
+        if data_path.exists():
+            return pd.read_parquet(data_path), "snapshot"
+        raise
+
+    df = _normalize_columns(pd.read_csv(io.BytesIO(body), engine="pyarrow"))
+
+    # Écriture atomique : un processus concurrent ne lit jamais un fichier à moitié écrit
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = data_path.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, data_path)
+    meta_path.write_text(json.dumps({
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }))
+    return df, "download"
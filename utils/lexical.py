@@ -0,0 +1,61 @@
+from __future__ import annotations
+import pickle
+from dataclasses import dataclass
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from utils.ocr_index import OcrIndex
+from utils.retrieval import scope_parts, scored_parts, top_k_indices
+
+
+LEXICAL_FILE = "lexical.pkl"  # à côté des fichiers de l'index OCR (même version)
+
+
+@dataclass(frozen=True)
+class LexicalIndex:
+    """
+    Index lexical TF-IDF (matrice creuse, lignes normalisées) aligné sur les chunks de
+    l'OcrIndex : retrouve les termes exacts (PPMS, DELF…) sans appel réseau.
+    """
+    vectorizer: TfidfVectorizer
+    matrix: sp.csr_matrix  # (n_chunks, vocabulaire) float32
+    version: str           # version de l'OcrIndex source
+
+    def candidates(
+        self, index: OcrIndex, query: str, etab: str | list[str] | None = None, top_k: int = 5
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k lexical : (positions des chunks, scores TF-IDF cosinus) ; rien si aucun terme connu."""
+        q = self.vectorizer.transform([query]).astype(np.float32).T.tocsc()
+        if q.nnz == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        chunks, scores = scored_parts(
+            scope_parts(index, etab), lambda p: (self.matrix[p.start:p.stop] @ q).toarray().ravel()
+        )
+        best = top_k_indices(scores, top_k)
+        best = best[scores[best] > 0]
+        return chunks[best], scores[best]
+
+
+def build_lexical(index: OcrIndex) -> LexicalIndex:
+    vectorizer = TfidfVectorizer(
+        strip_accents="unicode", lowercase=True, sublinear_tf=True, min_df=1, dtype=np.float32,
+    )
+    matrix = vectorizer.fit_transform(index.text(i) for i in range(len(index)))
+    return LexicalIndex(vectorizer, matrix.tocsr(), index.version)
+
+
+def load_or_build_lexical(index: OcrIndex) -> LexicalIndex:
+    """Index lexical persisté avec l'index OCR ; reconstruit si absent ou d'une autre version."""
+    path = index.path / LEXICAL_FILE if index.path is not None else None
+    if path is not None and path.exists():
+        with path.open("rb") as f:
+            lexical = pickle.load(f)
+        if lexical.version == index.version:
+            return lexical
+    lexical = build_lexical(index)
+    if path is not None:
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(lexical, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+    return lexical
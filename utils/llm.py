@@ -0,0 +1,52 @@
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import Iterator
+
+
+CHAT_MODEL = "gpt-5"
+
+
+@dataclass
+class TurnTimings:
+    """Chronométrage d'un tour de Q&A (secondes, horloge monotone)."""
+    started: float = field(default_factory=time.perf_counter)
+    first_token: float | None = None
+    finished: float | None = None
+    prompt_tokens: int | None = None
+
+    @property
+    def ttft(self) -> float | None:
+        """Délai avant le premier fragment de réponse (recherche comprise)."""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def total(self) -> float | None:
+        return None if self.finished is None else self.finished - self.started
+
+    def as_dict(self) -> dict[str, float | None]:
+        return {"ttft_s": self.ttft, "total_s": self.total, "prompt_tokens": self.prompt_tokens}
+
+
+def stream_chat(
+    client, messages: list[dict], model: str = CHAT_MODEL, timings: TurnTimings | None = None
+) -> Iterator[str]:
+    """Complétion en streaming : produit les fragments de texte au fil de l'eau."""
+    stream = client.chat.completions.create(
+        model=model,
+        temperature=1,
+        messages=messages,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if timings is not None and timings.first_token is None:
+                    timings.first_token = time.perf_counter()
+                yield delta
+    finally:
+        if timings is not None:
+            timings.finished = time.perf_counter()
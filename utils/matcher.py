@@ -0,0 +1,36 @@
+from __future__ import annotations
+import re
+import unicodedata
+
+
+def normalize_name(text: str) -> str:
+    """Minuscules, sans accents, `_` et `-` remplacés par des espaces, espaces réduits."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[_\-]+", " ", text.lower()).split())
+
+
+class EtabMatcher:
+    """
+    Détecteur d'établissements compilé une fois par version d'index : une seule regex
+    alternant tous les noms normalisés (les plus longs d'abord), bornée aux mots.
+    Une passe sur la question renvoie tous les établissements cités.
+    """
+
+    def __init__(self, docs: list[str]):
+        self._by_name: dict[str, str] = {}
+        for doc in docs:
+            name = normalize_name(doc)
+            if name:
+                self._by_name.setdefault(name, doc)
+        names = sorted(self._by_name, key=len, reverse=True)
+        self._pattern = (
+            re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, names)) + r")(?!\w)") if names else None
+        )
+
+    def find_all(self, query: str) -> list[str]:
+        """Établissements cités, dans l'ordre d'apparition, sans doublon."""
+        if self._pattern is None:
+            return []
+        found = (self._by_name[m.group(0)] for m in self._pattern.finditer(normalize_name(query)))
+        return list(dict.fromkeys(found))
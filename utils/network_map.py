@@ -0,0 +1,129 @@
+"""
+Carte du réseau (page RÉSEAU).
+
+Les colonnes utiles sont extraites une fois par version des données en tableaux
+float32 compacts ; la figure est construite une fois par (version, indicateur, niveau)
+et réutilisée. Au-delà de MAP_POINT_LIMIT établissements géolocalisés, les points
+sont agrégés côté serveur sur une grille dont le pas dépend du niveau de zoom :
+le volume envoyé au navigateur reste borné quelle que soit la taille du réseau.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from utils.aggregates import METRIC_COLS
+
+LAT_COL, LON_COL, NAME_COL = "latitude", "longitude", "etablissement"
+MAP_POINT_LIMIT = 2000  # au-delà : agrégation en grille
+DEFAULT_ZOOM = 1
+MAP_HEIGHT = 500
+MAP_STYLE = "open-street-map"
+
+
+@dataclass(frozen=True)
+class MapPoints:
+    """Établissements géolocalisés, colonnes utiles uniquement."""
+    lat: np.ndarray                 # float32
+    lon: np.ndarray                 # float32
+    names: np.ndarray               # object
+    metrics: dict[str, np.ndarray]  # colonne de score -> float32
+    version: str
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @property
+    def aggregated(self) -> bool:
+        return len(self) > MAP_POINT_LIMIT
+
+
+def map_points(df: pd.DataFrame, version: str) -> MapPoints:
+    if not {LAT_COL, LON_COL}.issubset(df.columns):
+        empty = np.empty(0, dtype=np.float32)
+        return MapPoints(empty, empty, np.empty(0, dtype=object), {c: empty for c in METRIC_COLS}, version)
+    lat = pd.to_numeric(df[LAT_COL], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    lon = pd.to_numeric(df[LON_COL], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    keep = ~(np.isnan(lat) | np.isnan(lon))
+    names = df[NAME_COL].astype(str).to_numpy()[keep] if NAME_COL in df.columns else np.full(keep.sum(), "—")
+    metrics = {
+        col: df[col].to_numpy(dtype=np.float32, na_value=np.nan)[keep] if col in df.columns
+        else np.full(keep.sum(), np.nan, dtype=np.float32)
+        for col in METRIC_COLS
+    }
+    return MapPoints(lat[keep], lon[keep], names, metrics, version)
+
+
+def cell_size(zoom: int) -> float:
+    """Pas de la grille en degrés : ~8 cellules par tuile, divisé par deux à chaque niveau."""
+    return 360.0 / (2 ** (zoom + 3))
+
+
+def grid_aggregate(points: MapPoints, metric_col: str, zoom: int) -> pd.DataFrame:
+    """
+    Une ligne par cellule non vide : centre de gravité, nombre d'établissements,
+    moyenne de l'indicateur et du score global (NaN ignorés). Si le niveau demandé
+    donne plus de MAP_POINT_LIMIT cellules, la grille est élargie jusqu'à repasser dessous.
+    """
+    while True:
+        size = cell_size(zoom)
+        gx = np.floor((points.lon + 180.0) / size).astype(np.int64)
+        gy = np.floor((points.lat + 90.0) / size).astype(np.int64)
+        cells, inverse, counts = np.unique(gy * (2 ** 32) + gx, return_inverse=True, return_counts=True)
+        if len(cells) <= MAP_POINT_LIMIT or zoom <= 0:
+            break
+        zoom -= 1
+
+    def cell_mean(values: np.ndarray) -> np.ndarray:
+        valid = ~np.isnan(values)
+        total = np.bincount(inverse, weights=np.where(valid, values, 0.0), minlength=len(cells))
+        n = np.bincount(inverse, weights=valid, minlength=len(cells))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (total / n).astype(np.float32)
+
+    return pd.DataFrame({
+        "lat": (np.bincount(inverse, weights=points.lat) / counts).astype(np.float32),
+        "lon": (np.bincount(inverse, weights=points.lon) / counts).astype(np.float32),
+        "n": counts.astype(np.int32),
+        "value": cell_mean(points.metrics[metric_col]),
+        "score_global": cell_mean(points.metrics["score_global"]),
+    })
+
+
+def map_figure(points: MapPoints, metric_col: str, zoom: int = DEFAULT_ZOOM) -> go.Figure:
+    """Figure de la carte : un point par établissement, ou une bulle par cellule si agrégée."""
+    if points.aggregated:
+        cells = grid_aggregate(points, metric_col, zoom)
+        trace = go.Scattermapbox(
+            lat=cells["lat"].to_numpy(), lon=cells["lon"].to_numpy(),
+            customdata=np.column_stack([cells["n"], cells["score_global"]]),
+            hovertemplate="<b>%{customdata[0]} établissements</b><br>"
+                          "Score global moyen = %{customdata[1]:.1f}<extra></extra>",
+            marker=dict(
+                color=cells["value"].to_numpy(),
+                size=np.clip(8 + 4 * np.log2(cells["n"].to_numpy()), 8, 40),
+                opacity=0.7,
+            ),
+        )
+    else:
+        trace = go.Scattermapbox(
+            lat=points.lat, lon=points.lon, hovertext=points.names,
+            customdata=points.metrics["score_global"],
+            hovertemplate="<b>%{hovertext}</b><br>Score global = %{customdata:.1f}<extra></extra>",
+            marker=dict(color=points.metrics[metric_col], size=15, opacity=0.7),
+        )
+    trace.marker.update(colorscale="Viridis", showscale=True, colorbar=dict(title="Moyenne"))
+
+    fig = go.Figure(trace)
+    fig.update_layout(
+        mapbox=dict(style=MAP_STYLE, zoom=zoom, center=_center(points)),
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=MAP_HEIGHT,
+    )
+    return fig
+
+
+def _center(points: MapPoints) -> dict[str, float]:
+    if not len(points):
+        return dict(lat=0.0, lon=0.0)
+    return dict(lat=float(np.mean(points.lat)), lon=float(np.mean(points.lon)))
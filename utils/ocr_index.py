@@ -0,0 +1,141 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+# Fichiers d'une version d'index, dans <cache>/<version>/
+EMBEDDINGS_FILE = "embeddings.npy"   # (n, d) float32, normalisées L2
+TEXTS_FILE = "texts.bin"             # textes UTF-8 concaténés
+META_FILE = "meta.parquet"           # doc, page, text_start, text_end
+INFO_FILE = "index.json"
+
+
+@dataclass(frozen=True)
+class OcrIndex:
+    """
+    Index OCR compact : une matrice d'embeddings contiguë et mappée en mémoire
+    (pages partagées entre processus) + une table de métadonnées légère.
+    """
+    embeddings: np.ndarray  # (n, d) float32 normalisées, np.memmap en lecture seule
+    meta: pd.DataFrame      # doc (category), page (int32), text_start / text_end (int64)
+    texts: np.ndarray       # uint8 mappé : textes UTF-8 concaténés
+    version: str
+    partitions: pd.DataFrame  # index = doc ; start / stop / n_chunks (chunks triés par doc)
+    path: Path | None = None  # répertoire de la version (fichiers annexes : ANN, ...)
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    @property
+    def docs(self) -> list[str]:
+        return list(self.partitions.index)
+
+    def doc_slice(self, doc: str) -> slice:
+        """Plage contiguë des chunks d'un document (vide si inconnu) : embeddings[s] est une vue."""
+        if doc not in self.partitions.index:
+            return slice(0, 0)
+        start, stop = self.partitions.loc[doc, ["start", "stop"]]
+        return slice(int(start), int(stop))
+
+    def chunk_counts(self) -> pd.Series:
+        """Nombre de chunks par document (diagnostic)."""
+        return self.partitions["n_chunks"]
+
+    def text(self, i: int) -> str:
+        start, end = self.meta["text_start"].iat[i], self.meta["text_end"].iat[i]
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+
+def _version(meta: pd.DataFrame, embeddings: np.ndarray, texts: bytes) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(pd.util.hash_pandas_object(meta, index=False).to_numpy().tobytes())
+    h.update(embeddings.tobytes())
+    h.update(texts)
+    return h.hexdigest()
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _prepare(df_index: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray, bytes]:
+    """DataFrame (doc, page, text, embedding) -> métadonnées, matrice normalisée, blob de texte."""
+    df = df_index[df_index["embedding"].notna()]
+    # Tri par doc : chaque établissement occupe une plage contiguë de la matrice
+    df = df.assign(doc=df["doc"].astype(str)).sort_values("doc", kind="stable")
+    embeddings = _normalize_rows(np.vstack(df["embedding"].to_numpy()).astype(np.float32))
+
+    encoded = [str(t).encode("utf-8") for t in df["text"].fillna("")]
+    ends = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    meta = pd.DataFrame({
+        "doc": pd.Categorical(df["doc"]),
+        "page": pd.to_numeric(df["page"], errors="coerce").fillna(-1).astype(np.int32).to_numpy(),
+        "text_start": ends - np.array([len(b) for b in encoded], dtype=np.int64),
+        "text_end": ends,
+    })
+    return meta, embeddings, b"".join(encoded)
+
+
+def write_index(meta: pd.DataFrame, embeddings: np.ndarray, texts: bytes, cache_dir: Path) -> Path:
+    """Écrit une version d'index (répertoire nommé par sa version) ; sans effet si elle existe déjà."""
+    version = _version(meta, embeddings, texts)
+    target = cache_dir / version
+    if target.exists():
+        return target
+
+    tmp = cache_dir / f".{version}.{os.getpid()}.tmp"
+    tmp.mkdir(parents=True, exist_ok=True)
+    np.save(tmp / EMBEDDINGS_FILE, np.ascontiguousarray(embeddings, dtype=np.float32))
+    (tmp / TEXTS_FILE).write_bytes(texts)
+    meta.to_parquet(tmp / META_FILE, index=False)
+    (tmp / INFO_FILE).write_text(json.dumps({
+        "version": version, "n_chunks": len(meta), "dim": int(embeddings.shape[1]),
+    }))
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Un autre processus a publié la même version entre-temps
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def open_index(path: Path) -> OcrIndex:
+    """Ouvre une version écrite par write_index, embeddings et textes mappés en mémoire."""
+    info = json.loads((path / INFO_FILE).read_text())
+    embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode="r")
+    texts_path = path / TEXTS_FILE
+    texts = (np.memmap(texts_path, dtype=np.uint8, mode="r") if texts_path.stat().st_size
+             else np.zeros(0, dtype=np.uint8))
+    meta = pd.read_parquet(path / META_FILE)
+    meta["doc"] = meta["doc"].astype("category")
+    return OcrIndex(
+        embeddings=embeddings, meta=meta, texts=texts, version=info["version"],
+        partitions=_partitions(meta), path=path,
+    )
+
+
+def _partitions(meta: pd.DataFrame) -> pd.DataFrame:
+    """Table des plages [start, stop) de chaque doc ; les métadonnées doivent être triées par doc."""
+    codes = meta["doc"].cat.codes.to_numpy()
+    if (np.diff(codes) < 0).any():
+        raise ValueError("Index OCR non trié par document : reconstruire l'index.")
+    categories = meta["doc"].cat.categories
+    start = np.searchsorted(codes, np.arange(len(categories)), side="left")
+    stop = np.searchsorted(codes, np.arange(len(categories)), side="right")
+    parts = pd.DataFrame({"start": start, "stop": stop, "n_chunks": stop - start},
+                         index=pd.Index(categories.astype(str), name="doc"))
+    return parts[parts["n_chunks"] > 0]
+
+
+def materialize_index(df_index: pd.DataFrame, cache_dir: Path) -> OcrIndex:
+    """Convertit l'index Parquet source (une liste d'embedding par ligne) en OcrIndex local."""
+    meta, embeddings, texts = _prepare(df_index)
+    return open_index(write_index(meta, embeddings, texts, cache_dir))
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+from typing import Callable
+import numpy as np
+from openai import AsyncOpenAI
+from utils.llm import CHAT_MODEL
+from utils.ocr_index import OcrIndex
+from utils.prompts import build_messages, format_context, map_messages
+from utils.retrieval import FUSION_DEPTH, Hit, dense_candidates, hits, rrf_fuse
+
+
+MAX_CONCURRENCY = 4   # appels simultanés au modèle pour l'étape map
+EMBED_TIMEOUT = 5     # secondes
+MAP_TIMEOUT = 90      # secondes par synthèse d'établissement
+
+
+@dataclass
+class ComparisonPlan:
+    """Résultat du pipeline : de quoi lancer l'appel final (reduce) en streaming."""
+    query_emb: np.ndarray | None
+    hits_by_etab: dict[str, list[Hit]]
+    messages: list[dict] | None = None  # None tant que l'étape map n'a pas tourné
+
+    @property
+    def chunks(self) -> list[int]:
+        return [h.chunk for hs in self.hits_by_etab.values() for h in hs]
+
+
+async def _embed(embed: Callable[[str], np.ndarray] | None, query: str, timeout: float) -> np.ndarray | None:
+    if embed is None:
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(embed, query), timeout)
+    except Exception:
+        return None  # recherche lexicale seule
+
+
+async def retrieve_per_etab(
+    index: OcrIndex,
+    query: str,
+    etabs: list[str],
+    embed: Callable[[str], np.ndarray] | None,
+    lexical=None,
+    top_k: int = 5,
+    embed_timeout: float = EMBED_TIMEOUT,
+) -> ComparisonPlan:
+    """
+    Embedding de la question et recherches lexicales par établissement en parallèle,
+    puis recherches denses + fusion RRF par établissement, elles aussi en parallèle
+    (NumPy relâche le GIL pendant les produits matriciels).
+    """
+    emb_task = asyncio.create_task(_embed(embed, query, embed_timeout))
+    lex_tasks = [
+        asyncio.create_task(asyncio.to_thread(lexical.candidates, index, query, e, FUSION_DEPTH))
+        for e in etabs
+    ] if lexical is not None else []
+
+    async def one(i: int, etab: str) -> list[Hit]:
+        query_emb = await emb_task
+        rankings = []
+        if query_emb is not None:
+            depth = FUSION_DEPTH if lex_tasks else top_k
+            chunks, scores = await asyncio.to_thread(dense_candidates, index, query_emb, etab, depth)
+            if not lex_tasks:
+                return hits(index, chunks, scores)
+            rankings.append(chunks)
+        if lex_tasks:
+            rankings.append((await lex_tasks[i])[0])
+        return hits(index, *rrf_fuse(rankings, top_k))
+
+    results = await asyncio.gather(*(one(i, e) for i, e in enumerate(etabs)))
+    return ComparisonPlan(await emb_task, dict(zip(etabs, results)))
+
+
+async def summarize_per_etab(
+    client: AsyncOpenAI,
+    query: str,
+    plan: ComparisonPlan,
+    model: str = CHAT_MODEL,
+    max_concurrency: int = MAX_CONCURRENCY,
+    timeout: float = MAP_TIMEOUT,
+    context_builder: Callable[[list[Hit], np.ndarray | None], str] | None = None,
+) -> ComparisonPlan:
+    """Étape map : une synthèse par établissement, en parallèle, puis messages de l'étape reduce."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def one(etab: str, results: list[Hit]) -> str:
+        if context_builder is None:
+            context = format_context(results)
+        else:
+            context = context_builder(results, plan.query_emb)
+        async with semaphore:
+            try:
+                resp = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model, temperature=1, messages=map_messages(query, etab, context)
+                    ),
+                    timeout,
+                )
+                return resp.choices[0].message.content
+            except Exception:
+                # Synthèse indisponible : on transmet les extraits bruts à l'étape reduce
+                return context
+
+    etabs = list(plan.hits_by_etab)
+    summaries = await asyncio.gather(*(one(e, plan.hits_by_etab[e]) for e in etabs))
+    context = "\n\n".join(f"### {e}\n{s}" for e, s in zip(etabs, summaries))
+    plan.messages = build_messages(query, etabs, context)
+    return plan
+
+
+async def plan_comparison(
+    client_factory: Callable[[], AsyncOpenAI],
+    index: OcrIndex,
+    query: str,
+    etabs: list[str],
+    embed: Callable[[str], np.ndarray] | None,
+    lexical=None,
+    top_k: int = 5,
+    skip_map: Callable[[ComparisonPlan], bool] | None = None,
+    context_builder: Callable[[list[Hit], np.ndarray | None], str] | None = None,
+) -> ComparisonPlan:
+    """
+    Pipeline complet d'une question comparative : retrieval parallèle par établissement,
+    puis (sauf si skip_map(plan), ex. réponse déjà en cache) synthèses map parallèles.
+    """
+    plan = await retrieve_per_etab(index, query, etabs, embed, lexical, top_k)
+    if skip_map is not None and skip_map(plan):
+        return plan
+    async with client_factory() as client:
+        return await summarize_per_etab(client, query, plan, context_builder=context_builder)
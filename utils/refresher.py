@@ -0,0 +1,91 @@
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+import pandas as pd
+from utils.scoring import IncrementalScores, compute_scores_incremental
+from utils.versioning import frame_version
+
+
+REFRESH_INTERVAL = 600  # secondes entre deux rechargements de la source
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """Version immuable des données scorées ; une session garde la sienne jusqu'au rerun suivant."""
+    df: pd.DataFrame
+    version: str
+    loaded_at: float       # construction de cette version
+    checked_at: float      # dernière vérification de la source
+    source: str            # retour de fetch_csv : download / not_modified / snapshot
+    rescored_rows: int
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.loaded_at
+
+
+class BackgroundRefresher:
+    """
+    Stale-while-revalidate : un thread recharge et rescore la source à intervalle régulier,
+    puis remplace la version courante d'un seul coup. Les lecteurs ne sont jamais bloqués,
+    sauf au tout premier chargement.
+    """
+
+    def __init__(self, fetch: Callable[[], tuple[pd.DataFrame, str]], interval: float = REFRESH_INTERVAL):
+        self._fetch = fetch
+        self._interval = interval
+        self._snapshot: DataSnapshot | None = None
+        self._scored: IncrementalScores | None = None
+        self._refresh_lock = threading.Lock()  # un seul rechargement à la fois
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_error: Exception | None = None
+
+    def current(self) -> DataSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._refresh_lock:
+                # Revérifié sous le verrou : au démarrage à froid, les sessions en attente
+                # réutilisent le chargement de la première au lieu d'en relancer un chacune
+                snapshot = self._snapshot or self._refresh()
+        return snapshot
+
+    def refresh(self) -> DataSnapshot:
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> DataSnapshot:
+        # Appelé avec _refresh_lock tenu
+        df, source = self._fetch()
+        now = time.time()
+        previous = self._snapshot
+        if previous is not None and source != "download":
+            # Source inchangée (304) ou indisponible : on garde la version en place
+            snapshot = DataSnapshot(previous.df, previous.version, previous.loaded_at, now, source, 0)
+        else:
+            scored = compute_scores_incremental(df, self._scored)
+            self._scored = scored
+            snapshot = DataSnapshot(
+                scored.frame, frame_version(scored.frame), now, now, source, scored.recomputed
+            )
+        self._snapshot = snapshot  # échange atomique de la référence
+        return snapshot
+
+    def start(self) -> "BackgroundRefresher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="data-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:  # la version précédente continue d'être servie
+                self.last_error = e
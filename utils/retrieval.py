@@ -0,0 +1,144 @@
+from __future__ import annotations
+from typing import NamedTuple
+import numpy as np
+from utils.ocr_index import OcrIndex
+
+
+class Hit(NamedTuple):
+    score: float
+    doc: str
+    page: int
+    text: str
+    chunk: int  # position du chunk dans l'index
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des k meilleurs scores par ordre décroissant (égalités dans l'ordre d'origine,
+    comme un tri stable). argpartition évite de trier tout le vecteur.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.arange(n) if k >= n else np.argpartition(-scores, k - 1)[:k]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def normalize(query_emb) -> np.ndarray:
+    q = np.asarray(query_emb, dtype=np.float32).ravel()
+    norm = np.linalg.norm(q)
+    return q / norm if norm else q
+
+
+# Constante de la fusion par rang réciproque (valeur usuelle de la littérature)
+RRF_K = 60
+# Profondeur des listes dense / lexicale fusionnées
+FUSION_DEPTH = 50
+
+
+def scope_parts(index: OcrIndex, etab: str | list[str] | None) -> list[slice]:
+    """Tranches contiguës de l'index couvertes par la portée (tout le réseau si etab est None)."""
+    if etab is None:
+        return [slice(0, len(index))]
+    return [index.doc_slice(e) for e in ([etab] if isinstance(etab, str) else etab)]
+
+
+def scored_parts(parts: list[slice], score_part) -> tuple[np.ndarray, np.ndarray]:
+    """Applique score_part à chaque tranche ; renvoie (positions des chunks, scores)."""
+    if len(parts) == 1:
+        return np.arange(parts[0].start, parts[0].stop), score_part(parts[0])
+    chunks = np.concatenate([np.arange(p.start, p.stop) for p in parts])
+    return chunks, np.concatenate([score_part(p) for p in parts])
+
+
+def dense_candidates(
+    index: OcrIndex,
+    query_emb,
+    etab: str | list[str] | None = None,
+    top_k: int = 5,
+    ann=None,
+    nprobe: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Top-k dense : (positions des chunks, similarités cosinus), par ordre décroissant."""
+    q = normalize(query_emb)
+    if etab is None and ann is not None:
+        from utils.ann import ANN_MIN_CHUNKS, DEFAULT_NPROBE, search_ivf
+        if len(index) >= ANN_MIN_CHUNKS and ann.version == index.version:
+            return search_ivf(index, ann, q, top_k, nprobe or DEFAULT_NPROBE)
+
+    # Portée établissement(s) : tranches contiguës de la matrice, sans copie
+    chunks, scores = scored_parts(scope_parts(index, etab), lambda p: index.embeddings[p] @ q)
+    best = top_k_indices(scores, top_k)
+    return chunks[best], scores[best]
+
+
+def search(
+    index: OcrIndex,
+    query_emb,
+    etab: str | list[str] | None = None,
+    top_k: int = 5,
+    ann=None,
+    nprobe: int | None = None,
+) -> list[Hit]:
+    """
+    Recherche par similarité cosinus : un produit matrice-vecteur sur les embeddings
+    déjà normalisés, puis top-k partiel. `etab` restreint la recherche à un ou plusieurs
+    établissements (top-k commun sur leurs partitions). Si un index ANN (`ann`,
+    utils.ann.IvfIndex) est fourni, il est utilisé pour les requêtes sur tout le réseau
+    d'un index assez grand ; les requêtes filtrées et les petits index restent exacts.
+    """
+    chunks, scores = dense_candidates(index, query_emb, etab, top_k, ann, nprobe)
+    return hits(index, chunks, scores)
+
+
+def rrf_fuse(rankings: list[np.ndarray], top_k: int, k: int = RRF_K) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fusion par rang réciproque : score(c) = somme des 1 / (k + rang) sur les listes où c apparaît.
+    Renvoie (positions des chunks, scores fusionnés) par ordre décroissant.
+    """
+    rankings = [r for r in rankings if len(r)]
+    if not rankings:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    all_chunks = np.concatenate(rankings)
+    all_scores = np.concatenate([1.0 / (k + np.arange(1, len(r) + 1)) for r in rankings])
+    chunks, inverse = np.unique(all_chunks, return_inverse=True)
+    fused = np.bincount(inverse, weights=all_scores)
+    best = top_k_indices(fused, top_k)
+    return chunks[best], fused[best]
+
+
+def hybrid_search(
+    index: OcrIndex,
+    query: str,
+    query_emb=None,
+    lexical=None,
+    etab: str | list[str] | None = None,
+    top_k: int = 5,
+    ann=None,
+    nprobe: int | None = None,
+    depth: int = FUSION_DEPTH,
+) -> list[Hit]:
+    """
+    Recherche hybride : listes dense et lexicale (utils.lexical.LexicalIndex) fusionnées
+    par RRF. Sans embedding de requête (query_emb None), la recherche est purement
+    lexicale et entièrement locale ; sans index lexical, purement dense.
+    """
+    if lexical is None:
+        if query_emb is None:
+            raise ValueError("Recherche impossible sans embedding de requête ni index lexical.")
+        return search(index, query_emb, etab, top_k, ann, nprobe)
+
+    rankings = [lexical.candidates(index, query, etab, depth)[0]]
+    if query_emb is not None:
+        rankings.insert(0, dense_candidates(index, query_emb, etab, depth, ann, nprobe)[0])
+    chunks, scores = rrf_fuse(rankings, top_k)
+    return hits(index, chunks, scores)
+
+
+def hits(index: OcrIndex, chunks: np.ndarray, scores: np.ndarray) -> list[Hit]:
+    docs, pages = index.meta["doc"], index.meta["page"]
+    return [
+        Hit(float(s), docs.iat[c], int(pages.iat[c]), index.text(c), int(c))
+        for c, s in zip(chunks, scores)
+    ]
@@ -0,0 +1,130 @@
+"""
+Parité et latence de la recherche exacte vectorisée (utils.retrieval.search).
+
+    python -m utils.retrieval_benchmark
+    python -m utils.retrieval_benchmark --chunks 10000 100000 1000000 --dim 256 --reference-chunks 100000
+
+La référence est l'ancienne recherche de la page Q&A (boucle iterrows + cosine_similarity
+sur un DataFrame d'embeddings), reprise telle quelle ci-dessous. Pour chaque taille, la
+commande mesure la latence p50 / p95 de search() sur tout le réseau et sur un établissement,
+et vérifie que l'ordre des résultats est identique à celui de la référence (jusqu'à
+--reference-chunks, la boucle devenant très lente au-delà). Code de sortie 1 si l'ordre diverge.
+"""
+from __future__ import annotations
+import argparse
+import shutil
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils import retrieval
+from utils.benchmark import _percentiles, synthetic_corpus
+from utils.ocr_index import OcrIndex
+
+
+def cosine_similarity(a, b):
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+
+def legacy_search(df_index: pd.DataFrame, query_emb, etab=None, top_k=5):
+    """Ancienne implémentation (boucle ligne à ligne), conservée comme référence."""
+    sub_df = df_index if etab is None else df_index[df_index["doc"] == etab]
+
+    sims = []
+    for _, row in sub_df.iterrows():
+        if row["embedding"] is None:
+            continue
+        emb = np.array(row["embedding"])
+        sims.append((cosine_similarity(query_emb, emb), row["doc"], row["page"], row["text"], row["chunk"]))
+
+    return sorted(sims, key=lambda x: x[0], reverse=True)[:top_k]
+
+
+def legacy_frame(index: OcrIndex) -> pd.DataFrame:
+    """L'index au format de l'ancien Parquet : une ligne par chunk, embedding en tableau."""
+    return pd.DataFrame({
+        "doc": index.meta["doc"].astype(str).to_numpy(),
+        "page": index.meta["page"].to_numpy(),
+        "text": [index.text(i) for i in range(len(index))],
+        "embedding": list(np.asarray(index.embeddings)),
+        "chunk": np.arange(len(index)),
+    })
+
+
+def order_mismatches(index: OcrIndex, df_index: pd.DataFrame, query_embs: list[np.ndarray],
+                     docs: list[str], top_k: int) -> int:
+    """Requêtes (réseau + établissement) dont l'ordre des chunks diffère de la référence."""
+    mismatches = 0
+    for q, doc in zip(query_embs, docs):
+        for etab in (None, doc):
+            ref = [c for *_, c in legacy_search(df_index, q, etab, top_k)]
+            new = [h.chunk for h in retrieval.search(index, q, etab=etab, top_k=top_k)]
+            mismatches += ref != new
+    return mismatches
+
+
+def _latencies(fn, args_list) -> list[float]:
+    fn(*args_list[0])  # échauffement (pages du memmap)
+    out = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--reference-chunks", type=int, default=100_000,
+                        help="taille max. pour la parité et le chrono de la boucle (lente au-delà)")
+    parser.add_argument("--reference-queries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows, failures = [], 0
+    for n in args.chunks:
+        index, queries, embedder, tmp = synthetic_corpus(n, args.dim, args.docs, n_queries=args.queries,
+                                                         seed=args.seed)
+        try:
+            embs = [embedder.embed([q.text])[0] for q in queries]
+            network = _percentiles(_latencies(lambda e: retrieval.search(index, e, top_k=args.k),
+                                              [(e,) for e in embs]))
+            scoped = _percentiles(_latencies(lambda e, d: retrieval.search(index, e, etab=d, top_k=args.k),
+                                             [(e, q.doc) for e, q in zip(embs, queries)]))
+            row = {"chunks": n, "reseau_p50_ms": network["p50_ms"], "reseau_p95_ms": network["p95_ms"],
+                   "etab_p50_ms": scoped["p50_ms"], "etab_p95_ms": scoped["p95_ms"]}
+            if n <= args.reference_chunks:
+                sample = slice(0, args.reference_queries)
+                df_index = legacy_frame(index)
+                t0 = time.perf_counter()
+                for e in embs[sample]:
+                    legacy_search(df_index, e, top_k=args.k)
+                row["boucle_ms"] = (time.perf_counter() - t0) * 1000 / len(embs[sample])
+                row["ecarts_ordre"] = order_mismatches(index, df_index, embs[sample],
+                                                       [q.doc for q in queries[sample]], args.k)
+                failures += row["ecarts_ordre"]
+            rows.append(row)
+        finally:
+            del index
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report = pd.DataFrame(rows).set_index("chunks")
+    print(f"Recherche exacte, {args.dim} dimensions, top {args.k}, {args.queries} requêtes")
+    print(report.round(3).to_string())
+    if failures:
+        print(f"Parité KO : {failures} requête(s) ordonnées différemment de la référence.", file=sys.stderr)
+        return 1
+    if "ecarts_ordre" in report:
+        print("Parité OK avec la boucle de référence.")
+    else:
+        print("Parité non vérifiée : toutes les tailles dépassent --reference-chunks.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
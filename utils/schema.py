@@ -0,0 +1,77 @@
+"""
+Schéma déclaré de la feuille : types compacts et rapport mémoire avant / après typage.
+
+    python -m utils.schema export.csv
+    python -m utils.schema "https://docs.google.com/spreadsheets/d/<id>/export?format=csv&gid=0"
+"""
+from __future__ import annotations
+import argparse
+import numpy as np
+import pandas as pd
+from utils.fetch import _normalize_columns
+
+
+# Schéma déclaré de la feuille (après normalisation des noms de colonnes)
+CATEGORY_COLS = [
+    "projet_etablissement_status",
+    "ppms_status",
+    "instances_status",
+    "orientation_post_bac",
+    "inclusion_dispositif",
+    "infrastructures",
+    "ressources_humaines",
+    "evaluations_nationales",
+    "niveau_max",
+    "pays",
+]
+# Entiers rétrogradés au plus petit type entier nullable ; les décimaux restent en float64
+# pour ne pas modifier les scores
+NUMERIC_COLS = ["nb_lve", "effectifs_total", "dnb_2024", "bac_2024", "nb_niveaux", "nb_personnels"]
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Types compacts : catégories pour les statuts, entiers réduits, chaînes Arrow pour le texte libre."""
+    for col in df.columns:
+        if col in CATEGORY_COLS:
+            df[col] = df[col].astype("category")
+        elif col in NUMERIC_COLS:
+            x = pd.to_numeric(df[col], errors="coerce")
+            if x.notna().any() and (x.dropna() % 1 == 0).all():
+                lo, hi = x.min(), x.max()
+                for int_type, info in (("Int8", np.iinfo(np.int8)), ("Int16", np.iinfo(np.int16)),
+                                       ("Int32", np.iinfo(np.int32)), ("Int64", np.iinfo(np.int64))):
+                    if info.min <= lo and hi <= info.max:
+                        x = x.astype(int_type)
+                        break
+            df[col] = x
+        elif df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+            df[col] = df[col].astype("string[pyarrow]")
+    return df
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Mémoire par colonne (octets, chaînes comprises) avant / après typage."""
+    report = pd.DataFrame({
+        "dtype_avant": before.dtypes.astype(str),
+        "octets_avant": before.memory_usage(deep=True, index=False),
+        "dtype_apres": after.dtypes.astype(str),
+        "octets_apres": after.memory_usage(deep=True, index=False),
+    })
+    report.loc["TOTAL", ["octets_avant", "octets_apres"]] = report[["octets_avant", "octets_apres"]].sum()
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="CSV de la feuille (chemin ou URL d'export)")
+    args = parser.parse_args(argv)
+
+    raw = _normalize_columns(pd.read_csv(args.source, engine="pyarrow"))
+    report = memory_report(raw, apply_schema(raw.copy()))
+    print(report.to_string())
+    before, after = report.loc["TOTAL", ["octets_avant", "octets_apres"]]
+    print(f"\n{before / 1e6:.1f} Mo -> {after / 1e6:.1f} Mo ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
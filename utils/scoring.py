@@ -1,4 +1,8 @@
 
+from __future__ import annotations
+import hashlib
+import json
+from dataclasses import dataclass
 import pandas as pd
 import numpy as np
 
@@ -14,6 +18,92 @@ DEFAULT_WEIGHTS = {
     "ressources_numerique": 0.10,
 }
 
+# Colonne de score -> clé de pondération (l'ordre fixe les colonnes de la matrice)
+SCORE_TO_WEIGHT = {
+    "score_resultats_aux_examens": "resultats_aux_examens",
+    "score_gouvernance_securite": "gouvernance_securite",
+    "score_strategie_partenariats": "strategie_partenariats",
+    "score_climat_inclusion": "climat_inclusion",
+    "score_ouverture_linguistique": "ouverture_linguistique",
+    "score_ressources_numerique": "ressources_numerique",
+}
+
+
+def _build_missing_texts() -> np.ndarray:
+    """Libellé « dimensions manquantes » pour chaque combinaison (indexé par bitmask)."""
+    cols = list(SCORE_TO_WEIGHT)
+    texts = []
+    for code in range(2 ** len(cols)):
+        missing = [c for i, c in enumerate(cols) if code >> i & 1]
+        if len(missing) == len(cols):
+            texts.append("Toutes les dimensions manquent")
+        elif missing:
+            texts.append("Score calculé sans : " + ", ".join(missing))
+        else:
+            texts.append("Complet")
+    return np.array(texts, dtype=object)
+
+
+_MISSING_TEXTS = _build_missing_texts()
+
+# --------------------
+# Grille de scoring (modifiable comme une donnée)
+# --------------------
+# Chaque dimension = moyenne des composantes renseignées. Types de composantes :
+#   percent  : valeur numérique bornée à 0–100
+#   scale    : valeur numérique (manquante = 0) bornée à [0, max] puis ramenée sur 100
+#   map      : statut -> points ; `lower` rend la grille insensible à la casse,
+#              `default` s'applique aux statuts inconnus ou manquants
+#   count    : liste séparée par virgules -> base + step * nb d'éléments, plafonné à cap
+#   presence : `present` si renseigné, `absent` sinon
+#   tiers    : liste -> `empty` si vide / non précisé, `low` si ≤ max_low éléments, `high` au-delà
+CERTIFS_RULE = {"kind": "tiers", "empty": 40, "low": 60, "high": 90, "max_low": 2,
+                "empty_values": ["", "non précisé"]}
+
+RUBRIC = {
+    "score_resultats_aux_examens": [
+        {"col": "dnb_2024", "kind": "percent"},
+        {"col": "bac_2024", "kind": "percent"},
+    ],
+    "score_gouvernance_securite": [
+        {"col": "projet_etablissement_status", "kind": "map",
+         "values": {"à jour": 90, "en construction": 60, "partiel": 60, "inexistant": 30}},
+        {"col": "ppms_status", "kind": "map",
+         "values": {"validé": 90, "en attente": 60, "pas d'information": 40}},
+        {"col": "instances_status", "kind": "map", "values": {"complètes": 90}, "default": 70},
+    ],
+    "score_strategie_partenariats": [
+        {"col": "projet_etablissement_axes", "kind": "count", "base": 40, "step": 12, "cap": 100},
+        {"col": "partenariats", "kind": "presence", "present": 80, "absent": 40},
+        {"col": "orientation_post_bac", "kind": "map", "lower": True, "values": {
+            "structuré mais diversifié": 90,
+            "structuré vers la france": 80,
+            "centré sur le pays hôte": 70,
+            "dispositif limité / informel": 40,
+            "—": 30,
+        }},
+    ],
+    "score_climat_inclusion": [
+        {"col": "inclusion_dispositif", "kind": "map", "lower": True,
+         "values": {"oui": 90, "en construction": 60, "non": 30}},
+    ],
+    "score_ouverture_linguistique": [
+        {"col": "nb_lve", "kind": "scale", "max": 5},
+        {"col": "certifications", **CERTIFS_RULE},
+    ],
+    "score_ressources_numerique": [
+        {"col": "infrastructures", "kind": "map", "lower": True, "values": {
+            "limitées": 30,
+            "fonctionnelles de base": 60,
+            "diversifiées et spécialisées": 80,
+            "campus complet et moderne": 100,
+        }},
+        {"col": "ressources_humaines", "kind": "map", "lower": True,
+         "values": {"structuré": 90, "perfectible": 70, "fragilisé": 40, "critique": 20}},
+        {"col": "certifications", **CERTIFS_RULE},
+    ],
+}
+
 # --------------------
 # Fonctions utilitaires réellement utilisées
 # --------------------
@@ -23,7 +113,7 @@ def _to_percent(s) -> pd.Series:
         return pd.Series([np.nan])
     if not isinstance(s, (pd.Series, pd.DataFrame)):
         s = pd.Series([s])
-    x = pd.to_numeric(s, errors="coerce")
+    x = pd.to_numeric(s, errors="coerce").astype(float)  # entiers nullables -> float64
     return x.clip(0, 100)
 
 
@@ -38,120 +128,171 @@ def _presence_score(series: pd.Series) -> pd.Series:
         return 80.0
     return series.map(f)
 
+
+def _cell_scorer(rule: dict):
+    """Fonction valeur -> points d'une composante catégorielle (appelée une fois par valeur distincte)."""
+    kind = rule["kind"]
+    if kind == "map":
+        values, default, lower = rule["values"], rule.get("default", np.nan), rule.get("lower", False)
+        def f(val):
+            if lower:
+                val = val.lower() if isinstance(val, str) else np.nan
+            return values.get(val, default)
+    elif kind == "count":
+        base, step, cap = rule["base"], rule["step"], rule["cap"]
+        def f(val):
+            if pd.isna(val):
+                return np.nan
+            return min(cap, base + len(str(val).split(",")) * step)
+    elif kind == "presence":
+        present, absent = rule["present"], rule["absent"]
+        def f(val):
+            return present if pd.notna(val) and str(val).strip() != "" else absent
+    elif kind == "tiers":
+        empty_values = set(rule["empty_values"])
+        def f(val):
+            if not isinstance(val, str) or val.strip().lower() in empty_values:
+                return rule["empty"]
+            return rule["low"] if len(val.split(",")) <= rule["max_low"] else rule["high"]
+    else:
+        raise ValueError(f"Type de composante inconnu : {kind!r}")
+    return f
+
+
+def compile_rubric(rubric: dict[str, list[dict]]) -> dict[str, list[tuple[str, str, object]]]:
+    """
+    Valide la grille et prépare chaque composante : (colonne, type, paramètre).
+    Pour les composantes catégorielles, le paramètre est la fonction de score par valeur distincte.
+    """
+    if list(rubric) != list(SCORE_TO_WEIGHT):
+        raise ValueError(f"La grille doit définir les dimensions {list(SCORE_TO_WEIGHT)}")
+    compiled = {}
+    for score_col, rules in rubric.items():
+        compiled[score_col] = [
+            (rule["col"], rule["kind"], rule if rule["kind"] in ("percent", "scale") else _cell_scorer(rule))
+            for rule in rules
+        ]
+    return compiled
+
+
+_COMPILED_RUBRIC = compile_rubric(RUBRIC)
+
+
+def _apply_rule(df: pd.DataFrame, rule: tuple, factorized: dict) -> pd.Series:
+    """
+    Score d'une composante sur tout le df. Les colonnes catégorielles sont factorisées
+    une seule fois (codes + valeurs distinctes) ; la fonction de score n'est évaluée que
+    sur les valeurs distinctes puis diffusée par indexation NumPy.
+    """
+    col, kind, param = rule
+    if kind == "percent":
+        return _to_percent(df.get(col))
+    if kind == "scale":
+        x = pd.to_numeric(df.get(col), errors="coerce").astype(float)
+        return (x.fillna(0).clip(0, param["max"]) / param["max"]) * 100
+
+    if col not in factorized:
+        factorized[col] = pd.factorize(df[col], use_na_sentinel=True)
+    codes, uniques = factorized[col]
+    # code -1 (valeur manquante) -> dernière case de la table
+    table = np.array([param(u) for u in uniques] + [param(np.nan)], dtype=float)
+    return pd.Series(table[codes], index=df.index)
+
+
+def _round_half(x: np.ndarray, decimals: int = 1) -> np.ndarray:
+    """
+    Arrondi décimal exact (comme round() Python) : np.round multiplie par 10**decimals,
+    ce qui fait basculer les valeurs proches d'un demi (ex. 72.55 stocké 72.5499…).
+    Seuls ces cas limites repassent par round().
+    """
+    out = np.round(x, decimals)
+    scaled = x * 10 ** decimals
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        out[i] = round(float(x[i]), decimals)
+    return out
+
+
+def _weight_vector(weights: dict[str, float] | None = None) -> np.ndarray:
+    """
+    Vecteur de poids dans l'ordre de SCORE_TO_WEIGHT.
+    `weights` peut ne surcharger qu'une partie des dimensions (le reste vient de DEFAULT_WEIGHTS).
+    """
+    merged = DEFAULT_WEIGHTS.copy()
+    if weights:
+        unknown = set(weights) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Dimensions de pondération inconnues : {sorted(unknown)}")
+        merged.update(weights)
+    vec = np.array([merged[k] for k in SCORE_TO_WEIGHT.values()], dtype=float)
+    if (vec < 0).any() or vec.sum() <= 0:
+        raise ValueError("Les pondérations doivent être positives et de somme non nulle.")
+    return vec
+
+
+def _weighted_scores(values: np.ndarray, valid: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Moyenne pondérée arrondie, poids renormalisés ligne par ligne sur les dimensions
+    renseignées (`valid`) ; NaN si aucune ne l'est. Seule implémentation du calcul :
+    compute_scores et reweight donnent donc des résultats identiques au bit près.
+    """
+    sub_weights = valid * weights
+    total_w = sub_weights.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm_weights = sub_weights / total_w
+    gscore = (np.where(valid, values, 0.0) * norm_weights).sum(axis=1)
+    gscore[~valid.any(axis=1)] = np.nan
+    return _round_half(gscore)
+
+
+def _global_scores(
+    values: np.ndarray, weights: dict[str, float] | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score global pondéré sur la matrice (n, 6) des scores de dimension.
+    Les poids sont renormalisés ligne par ligne sur les dimensions renseignées.
+    Retourne (score_global, incomplete_score, missing_dimensions).
+    """
+    valid = ~np.isnan(values)
+    gscore = _weighted_scores(values, valid, _weight_vector(weights))
+    codes = (~valid) @ (1 << np.arange(values.shape[1]))
+    return gscore, codes != 0, _MISSING_TEXTS[codes]
+
+
+def _dimension_scores(df: pd.DataFrame, compiled: dict) -> pd.DataFrame:
+    """Les 6 scores de dimension, non arrondis (colonnes dans l'ordre de SCORE_TO_WEIGHT)."""
+    factorized: dict[str, tuple[np.ndarray, np.ndarray]] = {}  # une factorisation par colonne source
+    return pd.DataFrame({
+        score_col: pd.concat([_apply_rule(df, rule, factorized) for rule in rules], axis=1).mean(axis=1)
+        for score_col, rules in compiled.items()
+    }, index=df.index)[list(SCORE_TO_WEIGHT)]
+
+
 # --------------------
 # Calcul des scores
 # --------------------
-def compute_scores(df: pd.DataFrame) -> pd.DataFrame:
+def compute_scores(
+    df: pd.DataFrame,
+    weights: dict[str, float] | None = None,
+    rubric: dict[str, list[dict]] | None = None,
+) -> pd.DataFrame:
+    """
+    Calcule les 6 scores de dimension et le score global.
+    `weights` surcharge tout ou partie de DEFAULT_WEIGHTS pour le score global,
+    `rubric` remplace la grille RUBRIC (même format).
+    """
     df = df.copy()
     df.columns = df.columns.str.lower()  # harmoniser les noms de colonnes
 
-    # === 1. Résultats aux examens ===
-    q_dnb = _to_percent(df.get("dnb_2024"))
-    q_bac = _to_percent(df.get("bac_2024"))
-    df["score_resultats_aux_examens"] = pd.concat({"dnb": q_dnb, "bac": q_bac}, axis=1).mean(axis=1)
-
-    # === 2. Gouvernance & sécurité ===
-    map_proj = {"à jour": 90, "en construction": 60, "partiel": 60, "inexistant": 30}
-    map_ppms = {"validé": 90, "en attente": 60, "pas d'information": 40}
-    map_instances = {"complètes": 90}
-
-    df["score_gouvernance_securite"] = pd.concat({
-        "proj": df["projet_etablissement_status"].map(map_proj),
-        "ppms": df["ppms_status"].map(map_ppms),
-        "inst": df["instances_status"].map(map_instances).fillna(70),
-    }, axis=1).mean(axis=1)
-
-    # === 3. Stratégie & partenariats ===
-    def score_axes(val):
-        if pd.isna(val):
-            return np.nan
-        return min(100, 40 + len(str(val).split(",")) * 12)
-
-    map_orientation = {
-        "structuré mais diversifié": 90,
-        "structuré vers la france": 80,
-        "centré sur le pays hôte": 70,
-        "dispositif limité / informel": 40,
-        "—": 30,
-    }
-
-    df["score_strategie_partenariats"] = pd.concat({
-        "axes": df["projet_etablissement_axes"].map(score_axes),
-        "part": df["partenariats"].apply(lambda x: 80 if pd.notna(x) and str(x).strip() != "" else 40),
-        "orient": df["orientation_post_bac"].str.lower().map(map_orientation),
-    }, axis=1).mean(axis=1)
-
-    # === 4. Climat & inclusion ===
-    map_inclusion = {"oui": 90, "en construction": 60, "non": 30}
-    df["score_climat_inclusion"] = df["inclusion_dispositif"].str.lower().map(map_inclusion)
-
-    # === 5. Ouverture linguistique & culturelle ===
-    x = pd.to_numeric(df.get("nb_lve"), errors="coerce")
-    lve_score = (x.fillna(0).clip(0, 5) / 5.0) * 100
-
-    def score_certifs(val):
-        if not isinstance(val, str) or val.strip().lower() in ["", "non précisé"]:
-            return 40
-        n = len(val.split(","))
-        return 60 if n <= 2 else 90
-
-    certif_score = df["certifications"].map(score_certifs)
-
-    df["score_ouverture_linguistique"] = pd.concat({
-        "lve": lve_score,
-        "cert": certif_score,
-    }, axis=1).mean(axis=1)
-
-    # === 6. Ressources & numérique ===
-    map_infra = {
-        "limitées": 30,
-        "fonctionnelles de base": 60,
-        "diversifiées et spécialisées": 80,
-        "campus complet et moderne": 100,
-    }
-    map_rh = {"structuré": 90, "perfectible": 70, "fragilisé": 40, "critique": 20}
-
-    df["score_ressources_numerique"] = pd.concat({
-        "infra": df["infrastructures"].str.lower().map(map_infra),
-        "rh": df["ressources_humaines"].str.lower().map(map_rh),
-        "certnum": df["certifications"].map(score_certifs),
-    }, axis=1).mean(axis=1)
+    # === 1 à 6. Scores de dimension (grille compilée) ===
+    compiled = _COMPILED_RUBRIC if rubric is None else compile_rubric(rubric)
+    dims = _dimension_scores(df, compiled)
+    df[list(dims)] = dims
 
     # === Score global avec ajustement dynamique ===
-    weights = DEFAULT_WEIGHTS.copy()
-    score_to_weight = {
-        "score_resultats_aux_examens": "resultats_aux_examens",
-        "score_gouvernance_securite": "gouvernance_securite",
-        "score_strategie_partenariats": "strategie_partenariats",
-        "score_climat_inclusion": "climat_inclusion",
-        "score_ouverture_linguistique": "ouverture_linguistique",
-        "score_ressources_numerique": "ressources_numerique",
-    }
-
-    global_scores, incomplete_flags, missing_texts = [], [], []
-    for _, row in df.iterrows():
-        vals = {col: row[col] for col in score_to_weight.keys()}
-        valid_dims = {k: v for k, v in vals.items() if not pd.isna(v)}
-        missing = [k for k, v in vals.items() if pd.isna(v)]
-
-        if not valid_dims:
-            global_scores.append(np.nan)
-            incomplete_flags.append(True)
-            missing_texts.append("Toutes les dimensions manquent")
-            continue
-
-        sub_weights = {k: weights[score_to_weight[k]] for k in valid_dims}
-        total_w = sum(sub_weights.values())
-        norm_weights = {k: w / total_w for k, w in sub_weights.items()}
-
-        gscore = sum(valid_dims[k] * norm_weights[k] for k in valid_dims)
-        global_scores.append(round(gscore, 1))
-        incomplete_flags.append(len(missing) > 0)
-        missing_texts.append("Score calculé sans : " + ", ".join(missing) if missing else "Complet")
-
-    df["score_global"] = global_scores
-    df["incomplete_score"] = incomplete_flags
-    df["missing_dimensions"] = missing_texts
+    df["score_global"], df["incomplete_score"], df["missing_dimensions"] = _global_scores(
+        dims.to_numpy(dtype=float), weights
+    )
 
         # === Arrondir toutes les colonnes de score ===
     score_cols = [
@@ -165,9 +306,153 @@ def compute_scores(df: pd.DataFrame) -> pd.DataFrame:
     ]
     df[score_cols] = df[score_cols].round(1)
 
-    return df
+    return add_ranks(df)
 
 
 def get_weights() -> dict[str, float]:
     total = sum(DEFAULT_WEIGHTS.values()) or 1.0
     return {k: v / total for k, v in DEFAULT_WEIGHTS.items()}
+
+
+# --------------------
+# Rangs et percentiles (réseau et pays)
+# --------------------
+RANKED_COLS = [*SCORE_TO_WEIGHT, "score_global"]
+COUNTRY_COL = "pays"
+
+
+def rank_col(score_col: str, kind: str = "rang") -> str:
+    """Nom de la colonne dérivée : rank_col("score_global", "pct_pays") -> "pct_pays_global"."""
+    return f"{kind}_{score_col.removeprefix('score_')}"
+
+
+RANK_COLS = [rank_col(c, kind) for c in RANKED_COLS for kind in ("rang", "pct", "rang_pays", "pct_pays")]
+
+
+def add_ranks(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute, pour chaque score, le rang (1 = meilleur, ex aequo au même rang) et le
+    percentile (part des établissements ayant un score inférieur ou égal), sur tout
+    le réseau et au sein du pays. Entiers compacts (Int32 / Int8), <NA> si score manquant.
+    """
+    scores = df[RANKED_COLS]
+    groups = [(None, scores)]
+    if COUNTRY_COL in df.columns:
+        groups.append(("pays", scores.groupby(df[COUNTRY_COL], observed=True, sort=False)))
+    for scope, frame in groups:
+        suffix = "" if scope is None else f"_{scope}"
+        rank = frame.rank(ascending=False, method="min")
+        below = frame.rank(ascending=True, method="max")
+        count = scores.notna().sum() if scope is None else frame.transform("count")
+        pct = (100 * below / count).round()
+        for col in RANKED_COLS:
+            df[rank_col(col, "rang" + suffix)] = rank[col].astype("Int32")
+            df[rank_col(col, "pct" + suffix)] = pct[col].astype("Int8")
+    return df
+
+
+# --------------------
+# Simulation de pondération (what-if)
+# --------------------
+@dataclass(frozen=True)
+class DimensionMatrix:
+    """Scores de dimension d'un df déjà scoré, prêts pour une repondération rapide."""
+    values: np.ndarray  # (n, 6) float64 non arrondis, 0 là où la dimension manque
+    valid: np.ndarray   # (n, 6) bool, True si la dimension est renseignée
+    version: str
+
+
+def dimension_matrix(
+    df: pd.DataFrame, version: str, rubric: dict[str, list[dict]] | None = None
+) -> DimensionMatrix:
+    """
+    Matrice dense des 6 scores de dimension + masque de validité. Les scores sont
+    recalculés depuis les colonnes source (une fois par version) : les colonnes score_*
+    du df sont arrondies au dixième, alors que score_global est calculé avant arrondi.
+    """
+    compiled = _COMPILED_RUBRIC if rubric is None else compile_rubric(rubric)
+    values = _dimension_scores(df, compiled).to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    return DimensionMatrix(
+        values=np.ascontiguousarray(np.where(valid, values, 0.0)),
+        valid=valid,
+        version=version,
+    )
+
+
+def reweight(matrix: DimensionMatrix, weights: dict[str, float] | None = None) -> np.ndarray:
+    """
+    Score global pour d'autres pondérations, avec exactement le calcul de compute_scores :
+    reweight(dimension_matrix(df, v)) reproduit df["score_global"].
+    """
+    return _weighted_scores(matrix.values, matrix.valid, _weight_vector(weights))
+
+
+# --------------------
+# Recalcul incrémental
+# --------------------
+# Colonnes produites par compute_scores (tout le reste vient du df source)
+SCORED_COLS = [*SCORE_TO_WEIGHT, "score_global", "incomplete_score", "missing_dimensions"]
+
+
+@dataclass(frozen=True)
+class IncrementalScores:
+    """Résultat de compute_scores_incremental, à repasser tel quel au rafraîchissement suivant."""
+    frame: pd.DataFrame
+    fingerprints: np.ndarray  # empreinte uint64 des colonnes d'entrée, une par ligne
+    config_key: str           # empreinte de la grille + des pondérations
+    recomputed: int           # nombre de lignes réellement rescorées
+
+
+def _config_key(weights: dict[str, float] | None, rubric: dict) -> str:
+    payload = json.dumps(
+        {"weights": _weight_vector(weights).tolist(), "rubric": rubric},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def row_fingerprints(df: pd.DataFrame, rubric: dict | None = None) -> np.ndarray:
+    """Empreinte de chaque ligne, calculée sur les seules colonnes lues par la grille."""
+    rubric = RUBRIC if rubric is None else rubric
+    cols = list(dict.fromkeys(rule["col"] for rules in rubric.values() for rule in rules))
+    cols = [c for c in cols if c in df.columns]
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+def compute_scores_incremental(
+    df: pd.DataFrame,
+    previous: IncrementalScores | None = None,
+    weights: dict[str, float] | None = None,
+    rubric: dict[str, list[dict]] | None = None,
+) -> IncrementalScores:
+    """
+    Comme compute_scores, mais ne rescore que les lignes dont les colonnes d'entrée
+    ont changé depuis `previous` (appariement par empreinte, indépendant de l'ordre).
+    Tout est recalculé si la grille ou les pondérations changent.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.lower()
+    rubric = RUBRIC if rubric is None else rubric
+    config_key = _config_key(weights, rubric)
+    fingerprints = row_fingerprints(df, rubric)
+
+    prev_pos = np.full(len(df), -1)
+    if previous is not None and previous.config_key == config_key and len(previous.frame):
+        first = ~pd.Index(previous.fingerprints).duplicated()
+        matches = pd.Index(previous.fingerprints[first]).get_indexer(fingerprints)
+        prev_pos = np.where(matches >= 0, np.flatnonzero(first)[matches], -1)
+    stale = prev_pos < 0
+
+    if stale.all():
+        return IncrementalScores(compute_scores(df, weights, rubric), fingerprints, config_key, len(df))
+
+    # Les rangs dépendent de tout le réseau : recalculés après fusion
+
+    fresh = compute_scores(df[stale], weights, rubric) if stale.any() else None
+    for col in SCORED_COLS:
+        values = previous.frame[col].to_numpy()[np.where(stale, 0, prev_pos)]
+        if fresh is not None:
+            values[stale] = fresh[col].to_numpy()
+        df[col] = values
+    return IncrementalScores(add_ranks(df), fingerprints, config_key, int(stale.sum()))
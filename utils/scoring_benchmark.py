@@ -0,0 +1,114 @@
+"""
+Parité et banc d'essai du score global vectorisé (utils.scoring._global_scores).
+
+    python -m utils.scoring_benchmark
+    python -m utils.scoring_benchmark --sizes 1000 100000 1000000 --parity-rows 100000
+
+La référence est l'ancienne boucle iterrows de compute_scores, reprise telle quelle
+ci-dessous. Toute divergence (score_global, incomplete_score, missing_dimensions)
+fait échouer la commande (code de sortie 1).
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from utils.scoring import DEFAULT_WEIGHTS, SCORE_TO_WEIGHT, _global_scores
+
+
+def legacy_global_scores(df: pd.DataFrame) -> tuple[list, list, list]:
+    """Ancienne implémentation (boucle ligne à ligne), conservée comme référence."""
+    weights = DEFAULT_WEIGHTS.copy()
+    score_to_weight = SCORE_TO_WEIGHT
+
+    global_scores, incomplete_flags, missing_texts = [], [], []
+    for _, row in df.iterrows():
+        vals = {col: row[col] for col in score_to_weight.keys()}
+        valid_dims = {k: v for k, v in vals.items() if not pd.isna(v)}
+        missing = [k for k, v in vals.items() if pd.isna(v)]
+
+        if not valid_dims:
+            global_scores.append(np.nan)
+            incomplete_flags.append(True)
+            missing_texts.append("Toutes les dimensions manquent")
+            continue
+
+        sub_weights = {k: weights[score_to_weight[k]] for k in valid_dims}
+        total_w = sum(sub_weights.values())
+        norm_weights = {k: w / total_w for k, w in sub_weights.items()}
+
+        gscore = sum(valid_dims[k] * norm_weights[k] for k in valid_dims)
+        global_scores.append(round(gscore, 1))
+        incomplete_flags.append(len(missing) > 0)
+        missing_texts.append("Score calculé sans : " + ", ".join(missing) if missing else "Complet")
+    return global_scores, incomplete_flags, missing_texts
+
+
+def synthetic_dimensions(n: int, missing_rate: float = 0.15, seed: int = 0) -> pd.DataFrame:
+    """
+    Scores de dimension plausibles : moyennes de 1 à 3 composantes entières (donc des
+    tiers et des demis, qui exercent les cas d'arrondi limites), avec des manquants.
+    Une colonne texte est incluse comme dans le df réel : iterrows renvoie alors des
+    float Python, et la boucle de référence arrondit avec round() et non np.round.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (n, len(SCORE_TO_WEIGHT))
+    components = rng.integers(0, 101, size=(*shape, 3)).astype(float)
+    n_parts = rng.integers(1, 4, size=shape)
+    used = np.arange(3) < n_parts[..., None]
+    values = (components * used).sum(axis=2) / n_parts
+    values[rng.random(shape) < missing_rate] = np.nan
+    values[rng.random(n) < 0.01] = np.nan  # quelques lignes entièrement vides
+    df = pd.DataFrame(values, columns=list(SCORE_TO_WEIGHT))
+    df.insert(0, "etablissement", [f"etablissement_{i}" for i in range(n)])
+    return df
+
+
+def check_parity(df: pd.DataFrame) -> int:
+    """Nombre de lignes où le moteur vectorisé diffère de la boucle de référence."""
+    g_ref, inc_ref, txt_ref = legacy_global_scores(df)
+    g, inc, txt = _global_scores(df[list(SCORE_TO_WEIGHT)].to_numpy(dtype=float))
+    g_ref = np.array(g_ref, dtype=float)
+    same = ((g == g_ref) | (np.isnan(g) & np.isnan(g_ref))) & (inc == np.array(inc_ref)) & (txt == np.array(txt_ref))
+    return int((~same).sum())
+
+
+def _timed(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--parity-rows", type=int, default=100_000,
+                        help="taille max. pour la parité et le chrono de la boucle (lente au-delà)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows, failures = [], 0
+    for n in args.sizes:
+        df = synthetic_dimensions(n, seed=args.seed)
+        values = df[list(SCORE_TO_WEIGHT)].to_numpy(dtype=float)
+        row = {"lignes": n, "vectorise_s": _timed(_global_scores, values)}
+        if n <= args.parity_rows:
+            row["boucle_s"] = _timed(legacy_global_scores, df)
+            row["ecarts"] = check_parity(df)
+            failures += row["ecarts"]
+        rows.append(row)
+
+    report = pd.DataFrame(rows).set_index("lignes")
+    if "boucle_s" in report:
+        report["acceleration"] = report["boucle_s"] / report["vectorise_s"]
+    print(report.round(4).to_string())
+    if failures:
+        print(f"Parité KO : {failures} ligne(s) divergent de la boucle de référence.", file=sys.stderr)
+        return 1
+    print("Parité OK avec la boucle de référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+from __future__ import annotations
+import hashlib
+import pandas as pd
+
+# Entrées gardées par les caches indexés sur une version (données ou index OCR) :
+# la version courante et celles encore affichées par des sessions ouvertes avant un rafraîchissement
+CACHED_VERSIONS = 3
+
+
+def frame_version(df: pd.DataFrame) -> str:
+    """
+    Empreinte courte du contenu d'un DataFrame (valeurs + colonnes).
+    Sert de clé de cache : deux chargements identiques donnent la même version.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update("|".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()